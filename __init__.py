@@ -1,34 +1,52 @@
 bl_info = {
-    "name": "Import Invictus SLRR SCX (.scx/.scy)",
+    "name": "Import-Export Invictus SLRR SCX (.scx/.scy)",
     "author": "downsided",
-    "description": "Import SCX v4 meshes",
+    "description": "Import and export SCX v3 and v4 meshes",
     "version": (1, 0, 0),
     "blender": (3, 6, 0),
     "warning": "Using this tool causes autism.",
     "doc_url": "https://github.com/nonamesex/io_invo_scx",
     "tracker_url": "https://github.com/nonamesex/io_invo_scx/issues",
-    "category": "Import"
+    "category": "Import-Export"
 }
 
-if 'bpy' in locals():
-    import importlib
-    importlib.reload(scx_import_ot)
-else:
-    from .src import scx_import_ot
+try:
+    import bpy
+except ImportError: # Imported without Blender, e.g. by parsing worker processes
+    bpy = None
 
-import bpy
+if bpy:
+    if 'scx_import_ot' in locals():
+        import importlib
+        importlib.reload(scx_import_ot)
+        importlib.reload(scx_export_ot)
+    else:
+        from .src import scx_import_ot
+        from .src import scx_export_ot
 
-classes = scx_import_ot.classes
+    classes = scx_import_ot.classes + scx_export_ot.classes
 
 def scx_import_menu_func(self, context):
     self.layout.operator(scx_import_ot.SCX_OT_import.bl_idname, text='Invictus SLRR Model (.scx/.scy)')
+    self.layout.operator(scx_import_ot.SCX_OT_import_placements.bl_idname, text='Invictus SLRR Model Placements (.json)')
+    self.layout.operator(scx_import_ot.SCX_OT_import_catalog.bl_idname, text='Invictus SLRR Models from Catalog')
+
+def scx_object_menu_func(self, context):
+    self.layout.operator(scx_import_ot.SCX_OT_load_full_detail.bl_idname)
+
+def scx_export_menu_func(self, context):
+    self.layout.operator(scx_export_ot.SCX_OT_export.bl_idname, text='Invictus SLRR Model (.scx)')
 
 def register():
     for cls in classes:
         bpy.utils.register_class(cls)
     bpy.types.TOPBAR_MT_file_import.append(scx_import_menu_func)
+    bpy.types.TOPBAR_MT_file_export.append(scx_export_menu_func)
+    bpy.types.VIEW3D_MT_object.append(scx_object_menu_func)
 
 def unregister():
+    bpy.types.VIEW3D_MT_object.remove(scx_object_menu_func)
+    bpy.types.TOPBAR_MT_file_export.remove(scx_export_menu_func)
     bpy.types.TOPBAR_MT_file_import.remove(scx_import_menu_func)
 
     for cls in reversed(classes):
@@ -0,0 +1,5 @@
+import sys
+
+from .src.scx_cli import main
+
+sys.exit(main())
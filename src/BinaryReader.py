@@ -1,19 +1,74 @@
+import mmap
 import struct
 from io import BufferedReader
 
+import numpy as np
+
 """
 Custom implementation of BinaryReader class, similar to C# version
 Supports both Big and Little endianness and some non-standard types, like:
 float16, GUID, sized string, null-terminated string
 """
-class BinaryReader:
+class MappedStream:
+    """
+    Read-only stream over a memory-mapped file.
+    Reads are memoryview slices, so no syscall or copy is made per field.
+    """
     def __init__(self, file):
-        self.__stream__: BufferedReader = open(file, "rb")
+        with open(file, "rb") as f:
+            try:
+                self.__mmap__ = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+                self.__view__ = memoryview(self.__mmap__)
+            except ValueError: # Empty file can't be mapped
+                self.__mmap__ = None
+                self.__view__ = memoryview(b"")
+        self.__pos__ = 0
+
+    def close(self):
+        self.__view__ = memoryview(b"")
+        if self.__mmap__:
+            try:
+                self.__mmap__.close()
+            except BufferError: # Arrays still point into the map, it is freed with them
+                pass
+            self.__mmap__ = None
+
+    def read(self, size = -1):
+        start = self.__pos__
+        if size < 0:
+            end = len(self.__view__)
+        else:
+            end = min(start + size, len(self.__view__))
+        self.__pos__ = max(start, end)
+        return self.__view__[start:end]
+
+    def seek(self, offset, whence = 0):
+        if whence == 1:
+            offset += self.__pos__
+        elif whence == 2:
+            offset += len(self.__view__)
+        if offset < 0:
+            raise ValueError("negative seek position")
+        self.__pos__ = offset
+        return self.__pos__
+
+    def tell(self):
+        return self.__pos__
+
+class BinaryReader:
+    def __init__(self, file, mapped = False):
+        if mapped:
+            self.__stream__: MappedStream = MappedStream(file)
+        else:
+            self.__stream__: BufferedReader = open(file, "rb")
 
     def __enter__(self):
         return self
 
     def __exit__(self, type, value, traceback):
+        self.close()
+
+    def close(self):
         self.__stream__.close()
 
     def seek(self, size = 0, whence = 1):
@@ -104,4 +159,15 @@ class BinaryReader:
             ret += c
 
     def ReadBytes(self, size: int):
-        return self.__stream__.read(size)
+        return bytes(self.__stream__.read(size))
+
+    # Bulk reads, zero-copy when the file is mapped
+    def ReadView(self, size: int):
+        data = self.__stream__.read(size)
+        if len(data) != size:
+            raise EOFError(f"expected {size} bytes, got {len(data)}")
+        return memoryview(data)
+
+    def ReadArray(self, count: int, dtype):
+        dtype = np.dtype(dtype)
+        return np.frombuffer(self.ReadView(count * dtype.itemsize), dtype = dtype, count = count)
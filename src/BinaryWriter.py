@@ -0,0 +1,89 @@
+import struct
+from io import BufferedWriter
+
+import numpy as np
+
+"""
+Counterpart of BinaryReader, writes the same types
+Whole blocks are written with WriteArray, which is a single tobytes() + write()
+"""
+class BinaryWriter:
+    def __init__(self, file):
+        self.__stream__: BufferedWriter = open(file, "wb")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.__stream__.close()
+
+    def seek(self, size = 0, whence = 1):
+        return self.__stream__.seek(size, whence)
+
+    def tell (self):
+        return self.__stream__.tell()
+
+    # Common types
+    def WriteBoolean(self, value: bool, endian = "<"):
+        self.__stream__.write(struct.pack(f"{endian}?", value))
+
+    def WriteChar(self, value: bytes, endian = "<"):
+        self.__stream__.write(struct.pack(f"{endian}c", value))
+
+    # Floating-point types
+    def WriteDouble(self, value: float, endian = "<"):
+        self.__stream__.write(struct.pack(f"{endian}d", value))
+
+    def WriteHalf(self, value: float, endian = "<"):
+        self.__stream__.write(struct.pack(f"{endian}e", value))
+
+    def WriteSingle(self, value: float, endian = "<"):
+        self.__stream__.write(struct.pack(f"{endian}f", value))
+
+    # Signed types
+    def WriteSByte(self, value: int, endian = "<"):
+        self.__stream__.write(struct.pack(f"{endian}b", value))
+
+    def WriteInt16(self, value: int, endian = "<"):
+        self.__stream__.write(struct.pack(f"{endian}h", value))
+
+    def WriteInt32(self, value: int, endian = "<"):
+        self.__stream__.write(struct.pack(f"{endian}i", value))
+
+    def WriteInt64(self, value: int, endian = "<"):
+        self.__stream__.write(struct.pack(f"{endian}q", value))
+
+    # Unsigned types
+    def WriteByte(self, value: int, endian = "<"):
+        self.__stream__.write(struct.pack(f"{endian}B", value))
+
+    def WriteUInt16(self, value: int, endian = "<"):
+        self.__stream__.write(struct.pack(f"{endian}H", value))
+
+    def WriteUInt32(self, value: int, endian = "<"):
+        self.__stream__.write(struct.pack(f"{endian}I", value))
+
+    def WriteUInt64(self, value: int, endian = "<"):
+        self.__stream__.write(struct.pack(f"{endian}Q", value))
+
+    # Custom types
+    def WriteSizedString(self, value: str, size: int = None, endian = "<"):
+        data = value.encode("utf-8")
+        self.__stream__.write(struct.pack(f"{endian}{size or len(data)}s", data))
+
+    def WriteNullTerminatedSizedString(self, value: str, size: int, endian = "<"):
+        # Truncated so at least one null byte is left
+        data = value.split("\x00", 1)[0].encode("utf-8")[:size - 1]
+        self.__stream__.write(struct.pack(f"{endian}{size}s", data))
+
+    def WriteNullTerminatedString(self, value: str):
+        self.__stream__.write(value.encode("utf-8") + b"\x00")
+
+    def WriteBytes(self, data: bytes):
+        self.__stream__.write(data)
+
+    # Bulk writes
+    def WriteArray(self, array: np.ndarray, dtype = None):
+        if dtype is not None:
+            array = np.asarray(array, dtype = dtype)
+        self.__stream__.write(np.ascontiguousarray(array).tobytes())
@@ -0,0 +1,205 @@
+import gc
+import importlib.util
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from . import scx_cache
+from .scx_reader import read_scx_data
+from .scx_writer import write_scx_data
+
+"""
+Import benchmarks on synthetic SCX files.
+Parsing is always measured, mesh building only when running inside Blender.
+"""
+
+# Common v4 vertex layouts
+VERTEX_FORMATS = {
+    "static": ["Position", "Normal", "UV1"],
+    "colored": ["Position", "Normal", "Color", "UV1", "UV2"],
+    "full": ["Position", "Normal", "Emissive", "Color", "UV1", "UV2", "UV3"],
+    "skinned": ["Position", "BoneWeight0", "BoneWeight1", "BoneWeight2", "BoneIndRef", "Normal", "UV1"]
+}
+
+# v3 layouts by material size, 44 and 64 byte vertices
+V3_FORMATS = {
+    "short": (56, ["Position", "Normal", "Color", "UV1", "UV2"]),
+    "extended": (136, ["Position", "Normal", "Color", "UV1", "UV2", "UV3"])
+}
+
+ATTRIBUTE_SHAPES = {
+    "Position": (3, np.float32),
+    "Normal": (3, np.float32),
+    "Emissive": (4, np.float32),
+    "Color": (4, np.float32),
+    "UV1": (2, np.float32),
+    "UV2": (2, np.float32),
+    "UV3": (2, np.float32),
+    "BoneWeight0": (1, np.float32),
+    "BoneWeight1": (1, np.float32),
+    "BoneWeight2": (1, np.float32),
+    "BoneIndRef": (4, np.uint8)
+}
+
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+MESH_SIZE = 16384 # Vertices per synthetic mesh
+
+def synthetic_mesh(rng: np.random.Generator, vertex_count: int, attributes: list, index: int, material_size: int = None):
+    vertex_data = {"count": vertex_count}
+
+    for key in attributes:
+        size, dtype = ATTRIBUTE_SHAPES[key]
+        if dtype == np.uint8:
+            vertex_data[key] = rng.integers(0, 256, (vertex_count, size), dtype = np.uint8)
+        elif key in ("Color", "Emissive"):
+            vertex_data[key] = np.round(rng.random((vertex_count, size), dtype = np.float32) * 255) / 255
+        else:
+            vertex_data[key] = rng.random((vertex_count, size), dtype = np.float32)
+
+    # Strip of triangles over consecutive vertices, about two triangles per vertex like real meshes
+    base = np.arange(max(vertex_count - 2, 0), dtype = np.uint32)
+    triangles = np.concatenate([
+        np.stack([base, base + 1, base + 2], axis = 1),
+        np.stack([base + 2, base + 1, base], axis = 1)[::3]
+    ])
+
+    material_data = {
+        "DiffuseColor": [1, 1, 1, 1],
+        "SpecularIntensity": 0.5,
+        "DiffuseMapIndex": 0xFFFF,
+        "name": f"bench_{index}"
+    }
+    if material_size:
+        material_data["size"] = material_size
+
+    return {"kind": "render", "material": material_data, "vertex": vertex_data, "face": triangles}
+
+def synthetic_scx(vertex_count: int, version: int = 4, vertex_format: str = "colored", seed: int = 0):
+    # vertex_format is a VERTEX_FORMATS key for v4 and a V3_FORMATS key for v3, extended if it isn't one
+    rng = np.random.default_rng(seed)
+    material_size = None
+    if version == 4:
+        attributes = VERTEX_FORMATS[vertex_format]
+    else:
+        material_size, attributes = V3_FORMATS.get(vertex_format, V3_FORMATS["extended"])
+
+    meshes_data = []
+    for start in range(0, vertex_count, MESH_SIZE):
+        meshes_data.append(synthetic_mesh(rng, min(MESH_SIZE, vertex_count - start), attributes, len(meshes_data), material_size))
+
+    return {"meshes": meshes_data, "version": version}
+
+def write_synthetic_scx(scx_path: str, vertex_count: int, version: int = 4, vertex_format: str = "colored"):
+    write_scx_data(scx_path, synthetic_scx(vertex_count, version, vertex_format))
+
+def measure(function, repeat: int = 3):
+    # Timed runs aren't traced, tracemalloc slows allocations down. Peak memory comes from one more traced run
+    best = None
+    result = None
+
+    for i in range(repeat):
+        result = None
+        gc.collect()
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    result = None
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = function()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return best, peak, result
+
+def remove_new_data(before: dict):
+    import bpy
+
+    for name in ("objects", "meshes", "materials"):
+        collection = getattr(bpy.data, name)
+        bpy.data.batch_remove([x for x in collection if x.as_pointer() not in before[name]])
+
+def bench_file(scx_path: str, repeat: int = 3, build: bool = False):
+    size = os.path.getsize(scx_path)
+
+    parse_time, parse_peak, scx_data = measure(lambda: read_scx_data(scx_path), repeat)
+    vertex_count = sum(mesh_data["vertex"]["count"] for mesh_data in scx_data["meshes"])
+
+    result = {
+        "path": scx_path,
+        "version": scx_data["version"],
+        "meshes": len(scx_data["meshes"]),
+        "vertices": vertex_count,
+        "size": size,
+        "parse_s": parse_time,
+        "parse_vertices_per_s": vertex_count / parse_time,
+        "parse_mb_per_s": size / parse_time / 1024 / 1024,
+        "parse_peak_mb": parse_peak / 1024 / 1024
+    }
+
+    if build:
+        import bpy
+        from .scx_import import build_scx
+
+        def build_once():
+            before = {name: {x.as_pointer() for x in getattr(bpy.data, name)} for name in ("objects", "meshes", "materials")}
+            start = time.perf_counter()
+            build_scx(scx_path, scx_data, [])
+            elapsed = time.perf_counter() - start
+            remove_new_data(before)
+            return elapsed
+
+        build_time = min(build_once() for i in range(repeat))
+        result["build_s"] = build_time
+        result["build_vertices_per_s"] = vertex_count / build_time
+
+    return result
+
+def run_benchmarks(sizes: list = None, formats: list = None, repeat: int = 3, directory: str = None, build: bool = None):
+    if build is None:
+        build = importlib.util.find_spec("bpy") is not None
+
+    sizes = sizes or DEFAULT_SIZES
+    formats = formats or list(VERTEX_FORMATS.keys())
+    cases = [(3, vertex_format) for vertex_format in V3_FORMATS] + [(4, vertex_format) for vertex_format in formats]
+
+    use_cache = scx_cache.USE_CACHE
+    scx_cache.setup_cache(False)
+
+    results = []
+    try:
+        with tempfile.TemporaryDirectory(dir = directory) as temp_dir:
+            for vertex_count in sizes:
+                for version, vertex_format in cases:
+                    name = f"v{version}_{vertex_format}"
+                    scx_path = os.path.join(temp_dir, f"bench_{name}_{vertex_count}.scx")
+                    write_synthetic_scx(scx_path, vertex_count, version, vertex_format)
+
+                    result = bench_file(scx_path, repeat, build)
+                    result["format"] = vertex_format
+                    result["path"] = os.path.basename(scx_path)
+                    results.append(result)
+
+                    os.remove(scx_path)
+    finally:
+        scx_cache.setup_cache(use_cache)
+
+    return results
+
+def format_results(results: list):
+    lines = [f"{'file':<36} {'verts':>9} {'MB':>8} {'parse ms':>9} {'Mvert/s':>8} {'MB/s':>8} {'peak MB':>8} {'build ms':>9}"]
+    for result in results:
+        build = f"{result['build_s'] * 1000:9.1f}" if "build_s" in result else f"{'-':>9}"
+        lines.append(
+            f"{result['path']:<36} {result['vertices']:>9} {result['size'] / 1024 / 1024:8.2f} "
+            f"{result['parse_s'] * 1000:9.1f} {result['parse_vertices_per_s'] / 1e6:8.2f} "
+            f"{result['parse_mb_per_s']:8.1f} {result['parse_peak_mb']:8.1f} {build}"
+        )
+    return "\n".join(lines)
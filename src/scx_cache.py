@@ -0,0 +1,159 @@
+import hashlib
+import json
+import os
+import zipfile
+
+import numpy as np
+
+"""
+On-disk cache of parsed SCX data.
+Every entry is an uncompressed .npz file with decoded arrays and a JSON blob for everything else.
+Entries are keyed by file path, size, mtime and PARSER_VERSION and evicted in LRU order.
+"""
+
+PARSER_VERSION = 5 # Bump when decoded data changes
+USE_CACHE = True
+CACHE_DIR = os.path.join(
+    os.environ.get("LOCALAPPDATA") or os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+    "io_invo_scx"
+)
+CACHE_MAX_SIZE = 512 * 1024 * 1024
+
+# Flag objects stored by their int value, registered by the parsers
+FLAG_TYPES = {}
+
+def register_flag_type(cls):
+    FLAG_TYPES[cls.__name__] = cls
+    return cls
+
+def cache_key(scx_path: str):
+    stat = os.stat(scx_path)
+    key = f"{os.path.abspath(scx_path)}|{stat.st_size}|{stat.st_mtime_ns}|{PARSER_VERSION}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+def cache_path(key: str):
+    return os.path.join(CACHE_DIR, key + ".npz")
+
+def pack_value(value, name: str, arrays: dict):
+    if isinstance(value, np.ndarray):
+        arrays[name] = value
+        return {"__array__": name}
+    elif isinstance(value, dict):
+        return {k: pack_value(v, f"{name}/{k}", arrays) for k, v in value.items()}
+    elif isinstance(value, (list, tuple)):
+        return [pack_value(v, f"{name}/{i}", arrays) for i, v in enumerate(value)]
+    elif type(value).__name__ in FLAG_TYPES:
+        return {"__flags__": type(value).__name__, "value": int(value)}
+    elif isinstance(value, np.generic):
+        return value.item()
+    return value
+
+def unpack_value(value, arrays):
+    if isinstance(value, dict):
+        if "__array__" in value:
+            return arrays[value["__array__"]]
+        if "__flags__" in value:
+            return FLAG_TYPES[value["__flags__"]](value["value"])
+        return {k: unpack_value(v, arrays) for k, v in value.items()}
+    elif isinstance(value, list):
+        return [unpack_value(v, arrays) for v in value]
+    return value
+
+def remove_file(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def load(scx_path: str):
+    if not USE_CACHE:
+        return None
+
+    try:
+        path = cache_path(cache_key(scx_path))
+        if not os.path.isfile(path):
+            return None
+    except OSError:
+        return None
+
+    # Empty, truncated or foreign entries are misses and removed
+    try:
+        with np.load(path, allow_pickle = False) as npz:
+            arrays = {name: npz[name] for name in npz.files}
+        meta = arrays.pop("__meta__")
+        scx_data = unpack_value(json.loads(meta.tobytes().decode("utf-8")), arrays)
+    except (OSError, ValueError, EOFError, KeyError, TypeError, zipfile.BadZipFile) as e:
+        print(f"SCX cache entry is invalid, removed: {e}")
+        remove_file(path)
+        return None
+
+    try:
+        os.utime(path) # Mark as recently used
+    except OSError:
+        pass
+    return scx_data
+
+def save(scx_path: str, scx_data: dict):
+    # Cache failures never fail an import, the file is parsed again next time
+    if not USE_CACHE or not scx_data:
+        return
+
+    temp_path = None
+    try:
+        arrays = {}
+        meta = pack_value(scx_data, "scx", arrays)
+        arrays["__meta__"] = np.frombuffer(json.dumps(meta).encode("utf-8"), dtype = np.uint8)
+
+        os.makedirs(CACHE_DIR, exist_ok = True)
+        path = cache_path(cache_key(scx_path))
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(temp_path, path)
+        temp_path = None
+    except (OSError, ValueError, TypeError) as e:
+        print(f"SCX cache write failed: {e}")
+        return
+    finally:
+        if temp_path:
+            remove_file(temp_path)
+
+    evict(CACHE_MAX_SIZE)
+
+def evict(max_size: int):
+    # Other processes write and evict the same directory, entries can vanish while scanning
+    try:
+        scanned = list(os.scandir(CACHE_DIR))
+    except OSError:
+        return
+
+    entries = []
+    for entry in scanned:
+        if not entry.name.endswith(".npz"):
+            continue
+        try:
+            stat = entry.stat()
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total_size = sum(entry[1] for entry in entries)
+
+    for mtime, size, path in sorted(entries):
+        if total_size <= max_size:
+            break
+        remove_file(path)
+        total_size -= size
+
+def clear():
+    evict(0)
+
+def setup_cache(use_cache = True, cache_dir = None, cache_max_size = None):
+    global USE_CACHE
+    USE_CACHE = use_cache
+    if cache_dir:
+        global CACHE_DIR
+        CACHE_DIR = cache_dir
+    if cache_max_size is not None:
+        global CACHE_MAX_SIZE
+        CACHE_MAX_SIZE = cache_max_size
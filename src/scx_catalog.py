@@ -0,0 +1,198 @@
+import contextlib
+import os
+import sqlite3
+import struct
+
+from . import scx_cache
+from .scx_reader import list_scx_meshes, read_tex_list
+
+"""
+SQLite catalog of the SCX files under game directories.
+Only headers are read (signature, version, v4 entry table or v3 material headers, vertex and face counts), payloads are skipped.
+Rescans only read files whose size or mtime, or their .tex file's, changed.
+"""
+
+CATALOG_VERSION = 1 # Bump when the schema or the scanned data changes, the catalog is rebuilt
+SCX_EXTENSIONS = (".scx", ".scy")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    stamp TEXT NOT NULL,
+    version INTEGER,
+    mesh_count INTEGER NOT NULL DEFAULT 0,
+    vertex_count INTEGER NOT NULL DEFAULT 0,
+    face_count INTEGER NOT NULL DEFAULT 0,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS meshes (
+    file_id INTEGER NOT NULL,
+    mesh_index INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    material TEXT,
+    vertex_count INTEGER NOT NULL,
+    face_count INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS textures (
+    file_id INTEGER NOT NULL,
+    texture_index INTEGER NOT NULL,
+    name TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS meshes_file ON meshes(file_id);
+CREATE INDEX IF NOT EXISTS meshes_material ON meshes(material);
+CREATE INDEX IF NOT EXISTS textures_file ON textures(file_id);
+CREATE INDEX IF NOT EXISTS textures_name ON textures(name);
+"""
+
+def default_catalog_path():
+    return os.path.join(scx_cache.CACHE_DIR, "catalog.sqlite")
+
+def connect(catalog_path: str = None):
+    catalog_path = catalog_path or default_catalog_path()
+    os.makedirs(os.path.dirname(os.path.abspath(catalog_path)), exist_ok = True)
+
+    db = sqlite3.connect(catalog_path)
+    if db.execute("PRAGMA user_version").fetchone()[0] != CATALOG_VERSION:
+        db.executescript("DROP TABLE IF EXISTS files; DROP TABLE IF EXISTS meshes; DROP TABLE IF EXISTS textures;")
+        db.execute(f"PRAGMA user_version = {CATALOG_VERSION}")
+    db.executescript(SCHEMA)
+    return db
+
+def file_stamp(scx_path: str):
+    stat = os.stat(scx_path)
+    tex_path = os.path.splitext(scx_path)[0] + ".tex"
+    tex_mtime = os.stat(tex_path).st_mtime_ns if os.path.isfile(tex_path) else 0
+    return f"{stat.st_size}:{stat.st_mtime_ns}:{tex_mtime}"
+
+def iter_scx_paths(root: str):
+    for directory, dir_names, file_names in os.walk(root):
+        dir_names.sort()
+        for file_name in sorted(file_names):
+            if file_name.lower().endswith(SCX_EXTENSIONS):
+                yield os.path.join(directory, file_name)
+
+def read_entry(scx_path: str):
+    try:
+        # Parser messages about unsupported files end up in the error column instead
+        with contextlib.redirect_stdout(None):
+            meshes = list_scx_meshes(scx_path)
+        if meshes is None:
+            return None, [], [], "not a supported SCX file"
+
+        with open(scx_path, "rb") as f:
+            version = struct.unpack("<4sI", f.read(8))[1]
+        return version, meshes, read_tex_list(scx_path), None
+    except (OSError, ValueError, EOFError, struct.error) as e:
+        return None, [], [], f"{type(e).__name__}: {e}"
+
+def update_entry(db: sqlite3.Connection, scx_path: str, stamp: str, file_id: int = None):
+    version, meshes, tex_list, error = read_entry(scx_path)
+
+    if file_id is not None:
+        db.execute("DELETE FROM meshes WHERE file_id = ?", (file_id,))
+        db.execute("DELETE FROM textures WHERE file_id = ?", (file_id,))
+        db.execute("DELETE FROM files WHERE id = ?", (file_id,))
+
+    cursor = db.execute(
+        "INSERT INTO files (path, stamp, version, mesh_count, vertex_count, face_count, error) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (
+            scx_path, stamp, version, len(meshes),
+            sum(mesh["vertex_count"] for mesh in meshes),
+            sum(mesh["face_count"] for mesh in meshes),
+            error
+        )
+    )
+    file_id = cursor.lastrowid
+
+    db.executemany(
+        "INSERT INTO meshes (file_id, mesh_index, kind, material, vertex_count, face_count) VALUES (?, ?, ?, ?, ?, ?)",
+        [(
+            file_id, i, mesh["kind"],
+            ((mesh["material"] or {}).get("name") or "").split("\x00", 1)[0],
+            mesh["vertex_count"], mesh["face_count"]
+        ) for i, mesh in enumerate(meshes)]
+    )
+    db.executemany(
+        "INSERT INTO textures (file_id, texture_index, name) VALUES (?, ?, ?)",
+        [(file_id, i, name) for i, name in enumerate(tex_list)]
+    )
+
+    return error is None
+
+def path_prefix(root: str):
+    return os.path.join(os.path.abspath(root), "")
+
+def scan_catalog(root: str, catalog_path: str = None):
+    """
+    Adds new and changed SCX files under root to the catalog and removes deleted ones.
+    Returns counts of scanned, updated, removed and failed files.
+    """
+    prefix = path_prefix(root)
+    stats = {"scanned": 0, "updated": 0, "removed": 0, "failed": 0}
+
+    with contextlib.closing(connect(catalog_path)) as db, db:
+        known = {
+            path: (file_id, stamp)
+            for file_id, path, stamp in db.execute("SELECT id, path, stamp FROM files WHERE substr(path, 1, ?) = ?", (len(prefix), prefix))
+        }
+
+        for scx_path in iter_scx_paths(prefix):
+            stats["scanned"] += 1
+            try:
+                stamp = file_stamp(scx_path)
+            except OSError:
+                continue
+
+            file_id, known_stamp = known.pop(scx_path, (None, None))
+            if stamp == known_stamp:
+                continue
+
+            if not update_entry(db, scx_path, stamp, file_id):
+                stats["failed"] += 1
+            stats["updated"] += 1
+
+        for file_id, stamp in known.values():
+            db.execute("DELETE FROM meshes WHERE file_id = ?", (file_id,))
+            db.execute("DELETE FROM textures WHERE file_id = ?", (file_id,))
+            db.execute("DELETE FROM files WHERE id = ?", (file_id,))
+            stats["removed"] += 1
+
+    return stats
+
+def like_pattern(pattern: str):
+    # * and ? wildcards, a plain name matches anywhere
+    pattern = pattern.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    if "*" not in pattern and "?" not in pattern:
+        return f"%{pattern}%"
+    return pattern.replace("*", "%").replace("?", "_")
+
+def find_scx_files(root: str = None, material: str = None, texture: str = None, min_vertices: int = 0, version: int = None, kind: str = None, catalog_path: str = None):
+    """
+    Paths of cataloged files matching every given filter, material and texture names are case-insensitive.
+    """
+    query = "SELECT path FROM files WHERE error IS NULL"
+    params = []
+
+    if root:
+        prefix = path_prefix(root)
+        query += " AND substr(path, 1, ?) = ?"
+        params += [len(prefix), prefix]
+    if version:
+        query += " AND version = ?"
+        params.append(version)
+    if min_vertices:
+        query += " AND vertex_count >= ?"
+        params.append(min_vertices)
+    if kind:
+        query += " AND id IN (SELECT file_id FROM meshes WHERE kind = ?)"
+        params.append(kind)
+    if material:
+        query += " AND id IN (SELECT file_id FROM meshes WHERE material LIKE ? ESCAPE '\\')"
+        params.append(like_pattern(material))
+    if texture:
+        query += " AND id IN (SELECT file_id FROM textures WHERE name LIKE ? ESCAPE '\\')"
+        params.append(like_pattern(texture))
+
+    with contextlib.closing(connect(catalog_path)) as db:
+        return [path for (path,) in db.execute(query + " ORDER BY path", params)]
@@ -0,0 +1,188 @@
+import argparse
+import contextlib
+import json
+import os
+import struct
+import sys
+
+import numpy as np
+
+from .scx_reader import parse_scx_data, read_tex_list, list_scx_meshes
+
+"""
+Command line interface for SCX files, works without Blender:
+python -m io_invo_scx info car.scx
+python -m io_invo_scx convert car.scx -o car.obj
+python -m io_invo_scx catalog C:/SLRR --material "*glass*"
+"""
+
+def to_json(value):
+    if isinstance(value, dict):
+        return {k: to_json(v) for k, v in value.items() if not isinstance(v, np.ndarray)}
+    elif isinstance(value, (list, tuple)):
+        return [to_json(v) for v in value]
+    elif isinstance(value, str):
+        return value.split("\x00", 1)[0]
+    elif isinstance(value, np.generic):
+        return value.item()
+    elif hasattr(value, "__int__") and not isinstance(value, (bool, int, float)):
+        return {"value": int(value), "names": str(value)}
+    return value
+
+def parse_quiet(scx_path: str):
+    # Parser messages would break JSON output
+    with contextlib.redirect_stdout(sys.stderr):
+        return parse_scx_data(scx_path)
+
+def scx_info(scx_path: str, with_tex: bool = False):
+    scx_data = parse_quiet(scx_path)
+    if not scx_data:
+        raise ValueError("not a supported SCX file")
+
+    info = {
+        "path": scx_path,
+        "size": os.path.getsize(scx_path),
+        "version": scx_data["version"],
+        "meshes": []
+    }
+
+    if "entries" in scx_data:
+        info["entries"] = scx_data["entries"]
+
+    for mesh_data in scx_data["meshes"]:
+        vertex_data = mesh_data.get("vertex") or {}
+        mesh_info = {
+            "material": to_json(mesh_data.get("material") or {}),
+            "vertex_count": vertex_data.get("count", 0),
+            "vertex_format": to_json(vertex_data.get("type")),
+            "attributes": [k for k, v in vertex_data.items() if isinstance(v, np.ndarray) and len(v) > 0],
+            "face_count": len(mesh_data.get("face", []))
+        }
+        info["meshes"].append(mesh_info)
+
+    if with_tex:
+        info["textures"] = read_tex_list(scx_path)
+
+    return info
+
+def write_obj(scx_data: dict, obj_path: str):
+    vertex_offset = 0
+
+    with open(obj_path, "wt", encoding = "utf-8") as obj:
+        for i, mesh_data in enumerate(scx_data["meshes"]):
+            vertex_data = mesh_data.get("vertex")
+            if not vertex_data or "face" not in mesh_data:
+                continue
+
+            material_data = mesh_data.get("material") or {}
+            name = to_json(material_data.get("name") or f"mesh_{i}")
+            obj.write(f"o {name}\n")
+            if material_data.get("name"):
+                obj.write(f"usemtl {name}\n")
+
+            np.savetxt(obj, vertex_data["Position"], fmt = "v %.6f %.6f %.6f")
+
+            face_format = "%d"
+            if len(vertex_data["UV1"]) > 0:
+                np.savetxt(obj, vertex_data["UV1"], fmt = "vt %.6f %.6f")
+                face_format += "/%d"
+            if len(vertex_data["Normal"]) > 0:
+                np.savetxt(obj, vertex_data["Normal"], fmt = "vn %.6f %.6f %.6f")
+                face_format += "/%d" if len(vertex_data["UV1"]) > 0 else "//%d"
+
+            indices = np.asarray(mesh_data["face"], dtype = np.int64) + vertex_offset + 1
+            repeat = face_format.count("%d")
+            np.savetxt(obj, np.repeat(indices, repeat, axis = 1), fmt = "f " + " ".join([face_format] * 3))
+
+            vertex_offset += vertex_data["count"]
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(prog = "io_invo_scx", description = "Inspect and convert Invictus SLRR SCX files")
+    commands = parser.add_subparsers(dest = "command", required = True)
+
+    info_parser = commands.add_parser("info", help = "dump header entries, meshes, vertex formats and materials as JSON")
+    info_parser.add_argument("files", nargs = "+")
+    info_parser.add_argument("--tex", action = "store_true", help = "include the .tex texture list")
+    info_parser.add_argument("--indent", type = int, default = None)
+
+    list_parser = commands.add_parser("list", help = "list meshes with counts, without decoding vertex and face data")
+    list_parser.add_argument("files", nargs = "+")
+
+    convert_parser = commands.add_parser("convert", help = "convert to Wavefront OBJ")
+    convert_parser.add_argument("file")
+    convert_parser.add_argument("-o", "--output")
+
+    bench_parser = commands.add_parser("bench", help = "time parsing (and mesh building inside Blender) of synthetic files")
+    bench_parser.add_argument("--sizes", type = int, nargs = "+", help = "vertex counts, default 1000 10000 100000 1000000")
+    bench_parser.add_argument("--formats", nargs = "+", help = "v4 vertex formats: static colored full skinned")
+    bench_parser.add_argument("--repeat", type = int, default = 3)
+    bench_parser.add_argument("--json", help = "also write results to this JSON file")
+
+    catalog_parser = commands.add_parser("catalog", help = "update the SQLite catalog of a game directory and print matching files")
+    catalog_parser.add_argument("root")
+    catalog_parser.add_argument("--db", help = "catalog file, default catalog.sqlite in the cache directory")
+    catalog_parser.add_argument("--material", help = "material name, * and ? are wildcards")
+    catalog_parser.add_argument("--texture", help = ".tex entry, * and ? are wildcards")
+    catalog_parser.add_argument("--min-vertices", type = int, default = 0)
+    catalog_parser.add_argument("--version", type = int, choices = [3, 4])
+    catalog_parser.add_argument("--kind", choices = ["render", "physics"])
+    catalog_parser.add_argument("--no-scan", action = "store_true", help = "query the catalog as it is")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "info":
+        failed = False
+        for scx_path in args.files:
+            try:
+                info = scx_info(scx_path, args.tex)
+            except Exception as e:
+                info = {"path": scx_path, "error": f"{type(e).__name__}: {e}"}
+                failed = True
+            print(json.dumps(info, indent = args.indent))
+        return 1 if failed else 0
+
+    elif args.command == "list":
+        failed = False
+        for scx_path in args.files:
+            try:
+                with contextlib.redirect_stdout(sys.stderr):
+                    meshes = list_scx_meshes(scx_path)
+            except (OSError, ValueError, EOFError, struct.error) as e:
+                print(f"{scx_path}: {type(e).__name__}: {e}", file = sys.stderr)
+                failed = True
+                continue
+            if meshes is None:
+                failed = True
+                continue
+            for mesh in meshes:
+                name = to_json((mesh["material"] or {}).get("name") or "")
+                print(f"{scx_path}\t{mesh['kind']}\t{name}\t{mesh['vertex_count']}\t{mesh['face_count']}")
+        return 1 if failed else 0
+
+    elif args.command == "bench":
+        from .scx_bench import run_benchmarks, format_results
+
+        results = run_benchmarks(args.sizes, args.formats, args.repeat)
+        print(format_results(results))
+        if args.json:
+            with open(args.json, "wt", encoding = "utf-8") as f:
+                json.dump(results, f, indent = 2)
+        return 0
+
+    elif args.command == "catalog":
+        from .scx_catalog import scan_catalog, find_scx_files
+
+        if not args.no_scan:
+            stats = scan_catalog(args.root, args.db)
+            print(", ".join(f"{k} {v}" for k, v in stats.items()), file = sys.stderr)
+        for scx_path in find_scx_files(args.root, args.material, args.texture, args.min_vertices, args.version, args.kind, args.db):
+            print(scx_path)
+        return 0
+
+    elif args.command == "convert":
+        scx_data = parse_quiet(args.file)
+        if not scx_data:
+            print(f"{args.file}: not a supported SCX file", file = sys.stderr)
+            return 1
+        write_obj(scx_data, args.output or os.path.splitext(args.file)[0] + ".obj")
+        return 0
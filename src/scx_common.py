@@ -0,0 +1,336 @@
+import numpy as np
+
+"""
+Shared helpers for vectorized SCX decoding.
+Convert raw little-endian vertex fields to Blender space in one pass over the whole block.
+"""
+
+def to_blender_axis(vectors: np.ndarray, scale: float = 1.0):
+    ret = np.empty((len(vectors), 3), dtype = np.float32)
+    ret[:, 0] = vectors[:, 0]
+    ret[:, 1] = -vectors[:, 2]
+    ret[:, 2] = vectors[:, 1]
+    if scale != 1.0:
+        ret *= np.float32(scale)
+    return ret
+
+def flip_uv(uvs: np.ndarray):
+    ret = np.empty((len(uvs), 2), dtype = np.float32)
+    ret[:, 0] = uvs[:, 0]
+    ret[:, 1] = 1 - uvs[:, 1]
+    return ret
+
+def unpack_color(colors: np.ndarray):
+    return np.ascontiguousarray(colors, dtype = np.float32) / np.float32(255)
+
+def from_blender_axis(vectors: np.ndarray, scale: float = 1.0):
+    ret = np.empty((len(vectors), 3), dtype = np.float32)
+    ret[:, 0] = vectors[:, 0]
+    ret[:, 1] = vectors[:, 2]
+    ret[:, 2] = -vectors[:, 1]
+    if scale != 1.0:
+        ret *= np.float32(scale)
+    return ret
+
+def pack_color(colors: np.ndarray):
+    return np.clip(np.rint(np.asarray(colors, dtype = np.float32) * 255), 0, 255).astype(np.uint8)
+
+def empty_attribute(size: int, dtype = np.float32):
+    return np.empty((0, size), dtype = dtype)
+
+def validate_indices(triangles: np.ndarray, vertex_count: int):
+    if len(triangles) > 0 and triangles.max() >= vertex_count:
+        bad = np.count_nonzero((triangles >= vertex_count).any(axis = 1))
+        raise ValueError(f"{bad} of {len(triangles)} triangles reference vertices beyond vertex count {vertex_count}")
+
+def grid_cells(positions: np.ndarray, size: float):
+    # Cell of every position as one int64 key and the key strides of the axes, at most 2^20 cells per axis
+    low = positions.min(axis = 0)
+    size = max(size, float((positions.max(axis = 0) - low).max()) / 2 ** 20)
+    cells = np.floor((positions - low) / np.float32(size)).astype(np.int64) + 1
+
+    # A margin of one cell on each side, so keys of neighboring cells don't wrap
+    spans = cells.max(axis = 0) + 2
+    strides = np.array([spans[1] * spans[2], spans[2], 1], dtype = np.int64)
+    return cells @ strides, strides
+
+def cluster_vertices(positions: np.ndarray, size: float):
+    # Vertices in the same cell of a grid of the given size are merged into the first of them
+    if len(positions) == 0:
+        return positions, np.empty(0, dtype = np.int32)
+
+    keys, _ = grid_cells(positions, size)
+    _, first, remap = np.unique(keys, return_index = True, return_inverse = True)
+    remap = remap.reshape(-1).astype(np.int32)
+    return np.ascontiguousarray(positions[first]), remap
+
+# Offsets to the cell itself and half of its neighbors, the other half is covered from the neighbor's side
+NEIGHBOR_CELLS = [(x, y, z) for x in (-1, 0, 1) for y in (-1, 0, 1) for z in (-1, 0, 1) if (x, y, z) >= (0, 0, 0)]
+
+def close_pairs(positions: np.ndarray, distance: float):
+    # Index pairs of vertices closer than distance, searched in neighboring cells of a grid at least that size
+    if len(positions) < 2:
+        return np.empty(0, dtype = np.int64), np.empty(0, dtype = np.int64)
+
+    # Searched in key order, sorted lookups are much faster
+    keys, strides = grid_cells(positions, distance)
+    order = np.argsort(keys, kind = "stable")
+    keys = keys[order]
+    firsts = []
+    seconds = []
+
+    for offset in NEIGHBOR_CELLS:
+        neighbor_keys = keys + int(np.dot(offset, strides))
+        start = np.searchsorted(keys, neighbor_keys, "left")
+        counts = np.searchsorted(keys, neighbor_keys, "right") - start
+        total = int(counts.sum())
+        if total == 0:
+            continue
+
+        first = order[np.repeat(np.arange(len(positions)), counts)]
+        second = order[np.repeat(start - np.cumsum(counts) + counts, counts) + np.arange(total)]
+        if offset == (0, 0, 0):
+            first, second = first[first < second], second[first < second]
+
+        delta = positions[first] - positions[second]
+        close = np.einsum("ij,ij->i", delta, delta) <= distance * distance
+        firsts.append(first[close])
+        seconds.append(second[close])
+
+    if not firsts:
+        return np.empty(0, dtype = np.int64), np.empty(0, dtype = np.int64)
+    return np.concatenate(firsts), np.concatenate(seconds)
+
+def weld_vertices(positions: np.ndarray, distance: float):
+    """
+    Vertices closer than distance are merged into the first of them, chains of close vertices become one.
+    Returns the kept positions in their original order and a remap table from old to new indices.
+    """
+    first, second = close_pairs(positions, distance)
+
+    # Every vertex points to the lowest index it's connected to, repeated until the pairs agree
+    labels = np.arange(len(positions))
+    while len(first):
+        low = np.minimum(labels[first], labels[second])
+        np.minimum.at(labels, labels[first], low)
+        np.minimum.at(labels, labels[second], low)
+        while not np.array_equal(labels[labels], labels):
+            labels = labels[labels]
+        if np.array_equal(labels[first], labels[second]):
+            break
+
+    kept, remap = np.unique(labels, return_inverse = True)
+    return np.ascontiguousarray(positions[kept]), remap.reshape(-1).astype(np.int32)
+
+def spread_extents(positions: np.ndarray):
+    # Largest two bounding box extents that aren't degenerate, one for line shaped meshes and none for a single point
+    if len(positions) == 0:
+        return np.empty(0)
+    extents = np.sort(np.ptp(positions, axis = 0).astype(np.float64))[::-1]
+    return extents[extents > extents[0] * 1e-6][:2]
+
+def cluster_size(positions: np.ndarray, target_count: int):
+    # Grid cell size leaving about target_count vertices of a surface or line spanning the bounding box
+    extents = spread_extents(positions)
+    if len(extents) == 0:
+        return 1.0
+    return float(min((np.prod(extents) / max(target_count, 1)) ** (1 / len(extents)), extents[0]))
+
+CLUSTER_STEPS = 6 # Cell size corrections towards the target vertex count
+CLUSTER_TOLERANCE = 0.1
+
+def cluster_to_count(positions: np.ndarray, target_count: int):
+    """
+    Vertex clustering leaving about target_count vertices, returns the kept positions and a remap table.
+    The cell size from the bounding box is corrected by the vertices left, curved or sparse meshes fill fewer cells.
+    """
+    target_count = max(target_count, 1)
+    dimensions = len(spread_extents(positions))
+    size = cluster_size(positions, target_count)
+    result = best = cluster_vertices(positions, size)
+    smaller = larger = None # Cell sizes known to leave too many and too few vertices
+
+    for _ in range(CLUSTER_STEPS):
+        count = len(result[0])
+        if dimensions == 0 or abs(count - target_count) <= target_count * CLUSTER_TOLERANCE:
+            break
+
+        if count > target_count:
+            smaller = size
+        else:
+            larger = size
+
+        # Vertex counts can jump, like when cells get wider than a thin part, so a known range is halved
+        if smaller is not None and larger is not None:
+            size = np.sqrt(smaller * larger)
+        else:
+            size *= (count / target_count) ** (1 / dimensions)
+        result = cluster_vertices(positions, size)
+        if abs(len(result[0]) - target_count) < abs(len(best[0]) - target_count):
+            best = result
+
+    return best
+
+DECIMATE_MIN_VERTICES = 8 # Small meshes would collapse to nothing, they keep at least a box worth of vertices
+
+def decimate_mesh(positions: np.ndarray, triangles: np.ndarray, ratio: float):
+    """
+    Vertex clustering: vertices in the same grid cell are merged, collapsed and repeated faces removed.
+    Keeps about ratio of the vertices, only for meshes without loop attributes like collision meshes.
+    """
+    remap = None
+    target_count = max(int(len(positions) * ratio), DECIMATE_MIN_VERTICES)
+    if len(positions) > target_count:
+        positions, remap = cluster_to_count(positions, target_count)
+    triangles, _ = prepare_triangles(triangles, True, remap)
+
+    used, triangles = np.unique(triangles, return_inverse = True)
+    return np.ascontiguousarray(positions[used]), triangles.reshape(-1, 3).astype(np.int32)
+
+# Corners of a unit cube as bits of the index (x, y, z), outward facing triangles
+BOX_CORNERS = np.array([[i & 1, (i >> 1) & 1, (i >> 2) & 1] for i in range(8)], dtype = np.float32)
+BOX_TRIANGLES = np.array([
+    [0, 2, 1], [1, 2, 3], [4, 5, 6], [5, 7, 6],
+    [0, 1, 4], [1, 5, 4], [2, 6, 3], [3, 6, 7],
+    [0, 4, 2], [2, 4, 6], [1, 3, 5], [3, 7, 5]
+], dtype = np.int32)
+
+def bounding_box(positions: np.ndarray):
+    if len(positions) == 0:
+        return np.empty((0, 3), dtype = np.float32), np.empty((0, 3), dtype = np.int32)
+    low = positions.min(axis = 0)
+    return low + BOX_CORNERS * (positions.max(axis = 0) - low), BOX_TRIANGLES.copy()
+
+def preview_mesh(positions: np.ndarray, triangles: np.ndarray, mode: str, ratio: float):
+    # "BOUNDS" or "DECIMATE", only positions and faces are used
+    if mode == "BOUNDS":
+        return bounding_box(positions)
+    return decimate_mesh(positions, triangles, ratio)
+
+def prepare_triangles(triangles: np.ndarray, skip_doubleside_faces: bool = True, remap: np.ndarray = None):
+    """
+    Returns triangles to build faces from and triangles to read per-vertex (loop) attributes with.
+    They are the same array unless vertices were welded with a remap table.
+    """
+    corners = np.asarray(triangles, dtype = np.int32).reshape(-1, 3)
+    triangles = corners if remap is None else remap[corners]
+
+    # Faces using the same vertex twice can't be created
+    degenerate = (
+        (triangles[:, 0] == triangles[:, 1])
+        | (triangles[:, 1] == triangles[:, 2])
+        | (triangles[:, 0] == triangles[:, 2])
+    )
+    triangles = triangles[~degenerate]
+    corners = corners[~degenerate]
+
+    if len(triangles) == 0:
+        return triangles, corners
+
+    # Same vertex set as an earlier face, either a duplicate or the back side of a double-sided face
+    _, first, inverse = np.unique(np.sort(triangles, axis = 1), axis = 0, return_index = True, return_inverse = True)
+    is_first = np.zeros(len(triangles), dtype = bool)
+    is_first[first] = True
+
+    if skip_doubleside_faces:
+        return triangles[is_first], corners[is_first]
+
+    # Repeated faces become a flipped copy of the first one
+    source = first[inverse.reshape(-1)]
+    flipped = triangles[source][:, ::-1]
+    flipped_corners = corners[source][:, ::-1]
+    return np.where(is_first[:, None], triangles, flipped), np.where(is_first[:, None], corners, flipped_corners)
+
+def skin_weights(vertex_data: dict):
+    """
+    Bone slots and weights of every vertex, (N, 4) each, or None without skinning data.
+    Same as Direct3D vertex blending: when less than 4 weights are stored, the next slot gets 1 minus their sum.
+    Without BoneIndRef slots are used in order.
+    """
+    stored = [vertex_data[f"BoneWeight{i}"] for i in range(4) if len(vertex_data.get(f"BoneWeight{i}", ())) > 0]
+    indices = vertex_data.get("BoneIndRef", ())
+
+    if not stored and len(indices) == 0:
+        return None
+
+    count = vertex_data["count"]
+    if len(indices) == 0:
+        indices = np.broadcast_to(np.arange(4, dtype = np.uint8), (count, 4))
+
+    weights = np.zeros((count, 4), dtype = np.float32)
+    if stored:
+        weights[:, :len(stored)] = np.concatenate(stored, axis = 1)
+    if len(stored) < 4:
+        weights[:, len(stored)] = np.clip(1 - weights.sum(axis = 1), 0, 1)
+
+    return np.asarray(indices, dtype = np.int32), weights
+
+def skin_groups(vertex_data: dict, palette: np.ndarray = None, remap: np.ndarray = None):
+    """
+    Vertex group name to (vertex indices, weights), one entry per bone.
+    Slots index palette (the bone list of the mesh) when there is one.
+    Welded vertices take the weights of the first vertex merged into them.
+    """
+    skin = skin_weights(vertex_data)
+    if skin is None:
+        return {}
+
+    indices, weights = skin
+    vertices = np.arange(len(indices), dtype = np.int64)
+    if remap is not None:
+        _, vertices = np.unique(remap, return_index = True)
+        indices, weights = indices[vertices], weights[vertices]
+        vertices = remap[vertices].astype(np.int64)
+
+    bones = indices
+    valid = weights > 0
+    if palette is not None and len(palette) > 0:
+        valid &= indices < len(palette)
+        bones = np.asarray(palette)[np.minimum(indices, len(palette) - 1)]
+
+    vertices = np.broadcast_to(vertices[:, None], bones.shape)[valid]
+    bones = bones[valid].astype(np.int64)
+    weights = weights[valid]
+
+    # Slots of one vertex pointing at the same bone are summed
+    keys, inverse = np.unique(bones * (vertices.max(initial = 0) + 1) + vertices, return_inverse = True)
+    weights = np.bincount(inverse.reshape(-1), weights, len(keys)).astype(np.float32)
+    bones, vertices = np.divmod(keys, vertices.max(initial = 0) + 1)
+
+    groups = {}
+    unique_bones, starts = np.unique(bones, return_index = True)
+    for bone, group_vertices, group_weights in zip(unique_bones, np.split(vertices, starts[1:]), np.split(weights, starts[1:])):
+        groups[f"Bone{bone}"] = (group_vertices.astype(np.int32), np.minimum(group_weights, 1))
+
+    return groups
+
+JOIN_DEFAULTS = {"Color": 1.0} # Value of loop attributes missing in some of the joined meshes
+
+def join_meshes(meshes: list):
+    """
+    Concatenates meshes from prepare_triangles into one.
+    Every item has "positions", "triangles", "corners", "attributes" (per vertex), "material_index" and optionally "groups" from skin_groups.
+    Returns positions, triangles, per corner attributes, per triangle material indices and vertex groups.
+    """
+    offsets = np.cumsum([0] + [len(x["positions"]) for x in meshes[:-1]])
+
+    positions = np.concatenate([x["positions"] for x in meshes])
+    triangles = np.concatenate([x["triangles"] + np.int32(offset) for x, offset in zip(meshes, offsets)])
+    material_indices = np.concatenate([np.full(len(x["triangles"]), x["material_index"], dtype = np.int32) for x in meshes])
+
+    attributes = {}
+    for name in dict.fromkeys(name for x in meshes for name in x["attributes"]):
+        columns = next(x["attributes"][name].shape[1] for x in meshes if name in x["attributes"])
+        attributes[name] = np.concatenate([
+            x["attributes"][name][x["corners"].ravel()] if name in x["attributes"]
+            else np.full((x["corners"].size, columns), JOIN_DEFAULTS.get(name, 0.0), dtype = np.float32)
+            for x in meshes
+        ])
+
+    groups = {}
+    for x, offset in zip(meshes, offsets):
+        for name, (vertices, weights) in x.get("groups", {}).items():
+            groups.setdefault(name, []).append((vertices + np.int32(offset), weights))
+    groups = {name: (np.concatenate([x[0] for x in items]), np.concatenate([x[1] for x in items])) for name, items in groups.items()}
+
+    return positions, triangles, attributes, material_indices, groups
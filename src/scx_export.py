@@ -0,0 +1,197 @@
+import os
+
+import bpy
+import numpy as np
+
+from .scx_materials import material_from_json, assign_texture
+from .scx_writer import write_scx_file
+
+V4_MAX_CORNERS = 0xFFFF # Enough to stay under the 65536 vertex limit of uint16 indices
+
+def texture_entry(image: bpy.types.Image, scx_dir: str):
+    # .tex entries are relative to the SCX file, images outside its directory keep only their file name
+    if not image.filepath:
+        return image.name
+
+    path = bpy.path.abspath(image.filepath, library = image.library)
+    try:
+        relative_path = os.path.relpath(path, scx_dir)
+    except ValueError: # Other drive
+        return bpy.path.basename(path)
+
+    if relative_path.startswith(os.pardir):
+        return bpy.path.basename(path)
+    return relative_path.replace("\\", "/")
+
+def get_material_image(material: bpy.types.Material, scx_dir: str):
+    if not material.use_nodes:
+        return None
+
+    for node in material.node_tree.nodes:
+        if node.type == "TEX_IMAGE" and node.image:
+            return texture_entry(node.image, scx_dir)
+
+def material_data_of(material: bpy.types.Material, version: int, tex_list: list, scx_dir: str):
+    if material is None:
+        return {"DiffuseColor": [1, 1, 1, 1], "name": ""}
+
+    if material.get("scx_material") and material.get("scx_version") == version:
+        material_data = material_from_json(material["scx_material"], tex_list)
+        material_data["name"] = material.name
+        return material_data
+
+    image = get_material_image(material, scx_dir)
+
+    material_data = {
+        "DiffuseColor": list(material.diffuse_color),
+        "SpecularIntensity": material.specular_intensity,
+        "name": material.name
+    }
+
+    if version == 3:
+        material_data["SpecularColor"] = list(material.specular_color)
+        material_data["DiffuseMapIndex"] = assign_texture(image, tex_list) if image else 0xFFFF
+    elif image:
+        material_data["DiffuseMap"] = {
+            "index": assign_texture(image, tex_list),
+            "channel": 0,
+            "tillingFlag": 3,
+            "tilling": [1, 1],
+            "offset": [0, 0]
+        }
+
+    return material_data
+
+def get_corner_colors(mesh: bpy.types.Mesh, name: str, loop_vertex: np.ndarray):
+    attribute = mesh.color_attributes.get(name)
+    if attribute is None or attribute.domain not in ("CORNER", "POINT"):
+        return None
+
+    colors = np.empty(len(attribute.data) * 4, dtype = np.float32)
+    attribute.data.foreach_get("color_srgb", colors)
+    colors = colors.reshape(-1, 4)
+
+    if attribute.domain == "POINT":
+        colors = colors[loop_vertex]
+    return colors
+
+def get_uv_layers(mesh: bpy.types.Mesh):
+    uv_layers = [mesh.uv_layers.get(f"UV{i + 1}") for i in range(3)]
+    if not any(uv_layers):
+        uv_layers = list(mesh.uv_layers[:3])
+    return [x for x in uv_layers if x is not None]
+
+def gather_corners(obj: bpy.types.Object, mesh: bpy.types.Mesh, apply_transform: bool, physics: bool):
+    mesh.calc_loop_triangles()
+    if bpy.app.version < (4, 1, 0):
+        mesh.calc_normals_split()
+
+    triangle_count = len(mesh.loop_triangles)
+    triangle_loops = np.empty(triangle_count * 3, dtype = np.int32)
+    mesh.loop_triangles.foreach_get("loops", triangle_loops)
+    triangle_materials = np.empty(triangle_count, dtype = np.int32)
+    mesh.loop_triangles.foreach_get("material_index", triangle_materials)
+
+    loop_count = len(mesh.loops)
+    loop_vertex = np.empty(loop_count, dtype = np.int32)
+    mesh.loops.foreach_get("vertex_index", loop_vertex)
+
+    positions = np.empty(len(mesh.vertices) * 3, dtype = np.float32)
+    mesh.vertices.foreach_get("co", positions)
+    positions = positions.reshape(-1, 3)
+
+    if apply_transform:
+        matrix = np.array(obj.matrix_world, dtype = np.float32)
+        positions = positions @ matrix[:3, :3].T + matrix[:3, 3]
+
+    # Per corner attributes, named like the vertex data of the readers
+    corners = {"Position": positions[loop_vertex]}
+
+    if not physics:
+        normals = np.empty(loop_count * 3, dtype = np.float32)
+        if bpy.app.version < (4, 1, 0):
+            mesh.loops.foreach_get("normal", normals)
+        else:
+            mesh.corner_normals.foreach_get("vector", normals)
+        normals = normals.reshape(-1, 3)
+
+        if apply_transform:
+            normals = normals @ np.linalg.inv(matrix[:3, :3])
+            normals /= np.maximum(np.linalg.norm(normals, axis = 1, keepdims = True), 1e-12)
+        corners["Normal"] = normals
+
+        for i, uv_layer in enumerate(get_uv_layers(mesh)):
+            uvs = np.empty(loop_count * 2, dtype = np.float32)
+            uv_layer.data.foreach_get("uv", uvs)
+            corners[f"UV{i + 1}"] = uvs.reshape(-1, 2)
+
+        for key in ("Color", "Emissive"):
+            colors = get_corner_colors(mesh, key, loop_vertex)
+            if colors is not None:
+                corners[key] = colors
+
+    return corners, triangle_loops.reshape(-1, 3), triangle_materials
+
+def split_corners(corners: dict, triangle_loops: np.ndarray):
+    # Corners with equal attributes become one SCX vertex
+    keys = list(corners.keys())
+    records = np.ascontiguousarray(np.concatenate([corners[key][triangle_loops.ravel()] for key in keys], axis = 1, dtype = np.float32))
+    records_void = records.view(np.dtype((np.void, records.dtype.itemsize * records.shape[1]))).ravel()
+    _, first, inverse = np.unique(records_void, return_index = True, return_inverse = True)
+
+    vertex_data = {}
+    column = 0
+    for key in keys:
+        size = corners[key].shape[1]
+        vertex_data[key] = np.ascontiguousarray(records[first, column:column + size])
+        column += size
+    vertex_data["count"] = len(first)
+
+    return vertex_data, inverse.reshape(-1, 3).astype(np.uint32)
+
+def gather_meshes(obj: bpy.types.Object, depsgraph, version: int, tex_list: list, scx_dir: str, apply_transform: bool = True):
+    eval_obj = obj.evaluated_get(depsgraph)
+    mesh = eval_obj.to_mesh()
+    meshes_data = []
+    physics = version == 4 and obj.get("scx_kind") == "physics"
+
+    try:
+        corners, triangle_loops, triangle_materials = gather_corners(obj, mesh, apply_transform, physics)
+
+        for material_index in np.unique(triangle_materials):
+            loops = triangle_loops[triangle_materials == material_index]
+
+            material = None
+            if material_index < len(obj.material_slots):
+                material = obj.material_slots[material_index].material
+
+            parts = [split_corners(corners, loops)]
+
+            # uint16 indices of v4 need big meshes split
+            if version == 4 and parts[0][0]["count"] > 0x10000:
+                chunk = V4_MAX_CORNERS // 3
+                parts = [split_corners(corners, loops[start:start + chunk]) for start in range(0, len(loops), chunk)]
+
+            for vertex_data, triangles in parts:
+                mesh_data = {"kind": "physics" if physics else "render", "vertex": vertex_data, "face": triangles}
+                if not physics:
+                    mesh_data["material"] = material_data_of(material, version, tex_list, scx_dir)
+                meshes_data.append(mesh_data)
+    finally:
+        eval_obj.to_mesh_clear()
+
+    return meshes_data
+
+def export_scx(scx_path: str, objects: list, version: int = 4, apply_transform: bool = True):
+    depsgraph = bpy.context.evaluated_depsgraph_get()
+    scx_dir = os.path.dirname(os.path.abspath(scx_path))
+    tex_list = []
+    meshes_data = []
+
+    for obj in objects:
+        if obj.type == "MESH":
+            meshes_data += gather_meshes(obj, depsgraph, version, tex_list, scx_dir, apply_transform)
+
+    write_scx_file(scx_path, {"meshes": meshes_data, "version": version}, tex_list)
+
+    return len(meshes_data)
@@ -0,0 +1,67 @@
+from bpy.props import StringProperty, BoolProperty, EnumProperty
+from bpy.types import Operator
+from bpy_extras.io_utils import ExportHelper
+
+from .scx_export import export_scx
+
+empty_set = set()
+
+class SCX_OT_export(Operator, ExportHelper):
+    bl_idname = 'export_mesh.scx'
+    bl_label = 'Export (.scx)'
+    bl_options = {'INTERNAL'}
+
+    __doc__ = 'Save a SCX file'
+
+    filename_ext = '.scx'
+    filter_glob: StringProperty(default='*.scx;*.scy', options={'HIDDEN'})
+
+    version: EnumProperty(
+        name = 'Version',
+        items = (
+            ('4', 'SCX v4', "Cars and newer parts, 65536 vertices per mesh, bigger meshes are split"),
+            ('3', 'SCX v3', "Old parts and track scenery")
+        ),
+        default = '4',
+        options = empty_set
+    )
+
+    use_selection: BoolProperty(
+        default = True,
+        name = 'Selected Only',
+        options = empty_set,
+        description = "Export selected objects only"
+    )
+
+    apply_transform: BoolProperty(
+        default = True,
+        name = 'Apply Transform',
+        options = empty_set,
+        description = "Bake object transforms into vertex positions and normals"
+    )
+
+    def execute(self, context):
+        if self.use_selection:
+            objects = context.selected_objects
+        else:
+            objects = context.scene.objects
+
+        try:
+            meshes_count = export_scx(self.filepath, objects, int(self.version), self.apply_transform)
+        except ValueError as e:
+            self.report({'ERROR'}, str(e))
+            return {'CANCELLED'}
+
+        self.report({'INFO'}, f'SCX exported, {meshes_count} meshes')
+
+        return {'FINISHED'}
+
+    def draw(self, context):
+        layout = self.layout
+        layout.prop(self, 'version')
+        layout.prop(self, 'use_selection')
+        layout.prop(self, 'apply_transform')
+
+classes = (
+    SCX_OT_export,
+)
@@ -1,75 +1,312 @@
 import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
 
-from .BinaryReader import BinaryReader
-from .scx_v3 import (
-    read_scx_data as read_scx_data_v3,
-    build_mesh as build_mesh_v3
-)
-from .scx_v4 import (
-    read_scx_data as read_scx_data_v4,
-    build_mesh as build_mesh_v4
-)
-
-def read_tex_list(scx_path: str, encoding: str = "UTF-8"):
-    tex_path = os.path.splitext(scx_path)[0] + ".tex"
-    tex_list = []
-
-    if os.path.isfile(tex_path):
+from mathutils import Matrix
+
+from . import scx_cache
+from .scx_instances import content_keys, duplicate_objects
+from .scx_profile import stage, record, log, timed_call, timed_iter
+from .scx_textures import preload_textures
+from .scx_reader import read_scx_data, read_tex_list, read_scx_file, stream_scx_data
+from .scx_v3 import build_mesh as build_mesh_v3
+from .scx_v4 import build_mesh as build_mesh_v4
+
+PARALLEL_PARSING = True # Parse files in worker processes, meshes are still built on the main thread
+IMPORT_MESHES = "BOTH" # "RENDER", "PHYSICS" (v4 HardSurfaceDef meshes) or "BOTH"
+STREAM_MESHES = False # Decode and build one mesh at a time, bypasses the cache and worker processes
+INSTANCE_FILES = True # Files with the same content are built once, other occurrences are linked duplicates
+PREVIEW_MODE = "NONE" # Preview builds ("BOUNDS" or "DECIMATE") skip textures and are marked for loading full detail later
+PREFETCH_FILES = 2 # Files parsed ahead per worker by ImportScheduler, parsed data waits in memory until it's built
+
+def mesh_kinds():
+    if IMPORT_MESHES == "RENDER":
+        return ("render",)
+    elif IMPORT_MESHES == "PHYSICS":
+        return ("physics",)
+    return None
+
+def run_steps(steps):
+    # Runs a build generator to the end and returns its result
+    while True:
         try:
-            with open(tex_path, "rt", encoding = encoding) as tex:
-                for line in tex.readlines():
-                    tex_name = line.strip("\r\n").split(maxsplit = 1)
-
-                    if len(tex_name) == 0:
-                        break
-                    else:
-                        tex_name = tex_name[0]
-
-                    tex_name = tex_name.split(">>>>>", 1)
-                    if len(tex_name) > 1:
-                        tex_name = tex_name[1]
-                    else:
-                        tex_name = tex_name[0]
-
-                    tex_list.append(tex_name)
-        except UnicodeDecodeError:
-            if encoding == "UTF-8":
-                tex_list = read_tex_list(scx_path, "ANSI")
-            elif encoding == "ANSI":
-                tex_list = read_tex_list(scx_path, "cp1251")
-            else:
-                tex_list = []
-
-    return tex_list
-
-def read_scx_data(scx_path: str):
-    with BinaryReader(scx_path) as scx:
-        signature = scx.ReadSizedString(4)
-        if signature != "INVO":
-            print("not invictus object")
-            return
-
-        version = scx.ReadUInt32()
-        if version == 3:
-            return read_scx_data_v3(scx)
-        elif version == 4:
-            return read_scx_data_v4(scx)
-        else:
-            print(f"SCX v{version} not supported")
-            return
+            next(steps)
+        except StopIteration as e:
+            return e.value
 
-def import_scx(scx_path: str):
-    print(f"Importing {scx_path}")
+def build_scx_steps(scx_path: str, scx_data: dict, tex_list: list):
+    # Yields the vertex count of every built mesh, returns the top level objects built
     scx_name = Path(scx_path).stem
-    scx_data = read_scx_data(scx_path)
-    tex_list = read_tex_list(scx_path)
     if scx_data:
-        if scx_data["version"] == 3:
-            build_mesh_v3(scx_data["meshes"], scx_name, tex_list)
-        elif scx_data["version"] == 4:
-            build_mesh_v4(scx_data["meshes"], scx_name, tex_list)
-
-def scx_import(scx_paths: str):
-    for scx_path in scx_paths:
-        import_scx(scx_path)
+        # Physics meshes and previews have no materials
+        if IMPORT_MESHES != "PHYSICS" and PREVIEW_MODE == "NONE":
+            with stage("textures", scx_name, count = len(tex_list)):
+                preload_textures(tex_list, scx_path)
+
+        # Includes the time between steps when built incrementally
+        with stage("build", scx_name):
+            if scx_data["version"] == 3:
+                roots = yield from build_mesh_v3(scx_data["meshes"], scx_name, tex_list)
+            elif scx_data["version"] == 4:
+                roots = yield from build_mesh_v4(scx_data["meshes"], scx_name, tex_list)
+            else:
+                roots = []
+
+        for bpy_obj in roots:
+            bpy_obj["scx_path"] = os.path.abspath(scx_path)
+            if PREVIEW_MODE != "NONE":
+                bpy_obj["scx_preview"] = PREVIEW_MODE
+        return roots
+
+    return []
+
+def build_scx(scx_path: str, scx_data: dict, tex_list: list):
+    return run_steps(build_scx_steps(scx_path, scx_data, tex_list))
+
+def import_scx_steps(scx_path: str):
+    log(f"Importing {scx_path}")
+    scx_name = Path(scx_path).stem
+
+    with stage("tex", scx_name):
+        tex_list = read_tex_list(scx_path)
+
+    if STREAM_MESHES:
+        scx_data = stream_scx_data(scx_path, mesh_kinds())
+        if scx_data:
+            scx_data["meshes"] = timed_iter(scx_data["meshes"], "parse", scx_name)
+    else:
+        with stage("parse", scx_name, count = os.path.getsize(scx_path)):
+            scx_data = read_scx_data(scx_path, mesh_kinds())
+
+    return (yield from build_scx_steps(scx_path, scx_data, tex_list))
+
+def import_scx(scx_path: str):
+    return run_steps(import_scx_steps(scx_path))
+
+def parse_pool(workers: int):
+    return ProcessPoolExecutor(
+        max_workers = workers,
+        initializer = scx_cache.setup_cache,
+        initargs = (scx_cache.USE_CACHE, scx_cache.CACHE_DIR, scx_cache.CACHE_MAX_SIZE)
+    )
+
+def parse_result(scx_path: str, future):
+    result, seconds = future.result()
+    # Measured in the worker, includes reading the .tex list
+    record("parse", seconds, Path(scx_path).stem, count = os.path.getsize(scx_path))
+    return result
+
+def scx_import_parallel(scx_paths: list):
+    objects = {}
+    workers = min(len(scx_paths), os.cpu_count() or 1)
+    pending = list(scx_paths)
+
+    # Only pool failures fall back to parsing here, errors of a file are raised as they are
+    try:
+        pool = parse_pool(workers)
+    except OSError as e:
+        print(f"Parallel parsing failed ({e}), importing files one by one")
+    else:
+        with pool:
+            try:
+                futures = [(scx_path, pool.submit(timed_call, read_scx_file, scx_path, mesh_kinds())) for scx_path in scx_paths]
+
+                # Built in the given order, so object names don't depend on which parse finishes first
+                for scx_path, future in futures:
+                    log(f"Importing {scx_path}")
+                    objects[scx_path] = build_scx(scx_path, *parse_result(scx_path, future))
+                    pending.remove(scx_path)
+            except BrokenProcessPool as e:
+                print(f"Parallel parsing failed ({e}), importing remaining files one by one")
+
+    for scx_path in pending:
+        objects[scx_path] = import_scx(scx_path)
+
+    return objects
+
+def instance_paths(scx_paths: list):
+    # Content keys by path and the paths to build, the first one of each content
+    if not INSTANCE_FILES:
+        return {}, list(scx_paths)
+
+    with stage("hash", count = len(scx_paths)):
+        keys = content_keys(scx_paths)
+
+    first_paths = {}
+    for scx_path, key in keys.items():
+        first_paths.setdefault(key, scx_path)
+    return keys, list(first_paths.values())
+
+def add_instances(scx_paths: list, keys: dict, objects: dict):
+    if not INSTANCE_FILES:
+        return
+
+    built = {keys[scx_path]: roots for scx_path, roots in objects.items()}
+    with stage("instances", count = len(scx_paths) - len(built)):
+        for scx_path in scx_paths:
+            if scx_path not in objects:
+                objects[scx_path] = duplicate_objects(built[keys[scx_path]])
+
+def place_objects(objects: dict, placements: list):
+    placed = set()
+
+    with stage("placements", count = len(placements)):
+        for scx_path, transform in placements:
+            roots = objects.get(scx_path) or []
+            if scx_path in placed:
+                roots = duplicate_objects(roots, INSTANCE_FILES)
+            placed.add(scx_path)
+
+            for bpy_obj in roots:
+                bpy_obj.matrix_world = Matrix(transform)
+
+def placement_paths(placements: list):
+    return list(dict.fromkeys(scx_path for scx_path, transform in placements))
+
+def scx_import(scx_paths: list):
+    """
+    Returns top level objects by file path.
+    With INSTANCE_FILES only the first file of each content is parsed and built.
+    """
+    keys, build_paths = instance_paths(scx_paths)
+
+    if PARALLEL_PARSING and not STREAM_MESHES and len(build_paths) > 1:
+        objects = scx_import_parallel(build_paths)
+    else:
+        objects = {scx_path: import_scx(scx_path) for scx_path in build_paths}
+
+    add_instances(scx_paths, keys, objects)
+    return objects
+
+def scx_import_placements(placements: list):
+    """
+    placements are (scx_path, transform) pairs, transform is a 4x4 matrix.
+    Every file is imported once, other placements of it are duplicates, linked with INSTANCE_FILES.
+    """
+    place_objects(scx_import(placement_paths(placements)), placements)
+
+class ImportScheduler():
+    """
+    Incremental scx_import or scx_import_placements for modal operators, call step until it returns True.
+    Files are parsed ahead in worker processes while earlier ones are built on the main thread.
+    """
+    def __init__(self, scx_paths: list, placements: list = None):
+        if placements is not None:
+            scx_paths = placement_paths(placements)
+
+        self.scx_paths = scx_paths
+        self.placements = placements
+        self.keys, self.build_paths = instance_paths(scx_paths)
+        self.objects = {}
+        self.done = 0 # Files built
+        self.queue = list(self.build_paths)
+        self.parsing = {} # Path to parse future, in build order
+        self.steps = None
+        self.steps_path = None
+        self.pool = None
+        self.workers = min(len(self.build_paths), os.cpu_count() or 1)
+
+        if PARALLEL_PARSING and not STREAM_MESHES and len(self.build_paths) > 1:
+            try:
+                self.pool = parse_pool(self.workers)
+            except OSError as e:
+                print(f"Parallel parsing failed ({e}), importing files one by one")
+
+    @property
+    def total(self):
+        return len(self.build_paths)
+
+    def prefetch(self):
+        while self.queue and len(self.parsing) < self.workers * PREFETCH_FILES:
+            scx_path = self.queue.pop(0)
+            self.parsing[scx_path] = self.pool.submit(timed_call, read_scx_file, scx_path, mesh_kinds())
+
+    def stop_pool(self):
+        # Files not parsed yet are imported one by one
+        self.queue = list(self.parsing) + self.queue
+        self.parsing.clear()
+        self.pool.shutdown(wait = False, cancel_futures = True)
+        self.pool = None
+
+    def next_file(self):
+        # False while the next file is still being parsed
+        if self.pool is None:
+            self.steps_path = self.queue.pop(0)
+            self.steps = import_scx_steps(self.steps_path)
+            return True
+
+        self.prefetch()
+        scx_path, future = next(iter(self.parsing.items()))
+        if not future.done():
+            return False
+
+        del self.parsing[scx_path]
+        try:
+            result = parse_result(scx_path, future)
+        except BrokenProcessPool as e:
+            print(f"Parallel parsing failed ({e}), importing remaining files one by one")
+            self.stop_pool()
+            self.queue.insert(0, scx_path)
+            return True
+
+        log(f"Importing {scx_path}")
+        self.steps_path = scx_path
+        self.steps = build_scx_steps(scx_path, *result)
+        self.prefetch()
+        return True
+
+    def step(self, max_meshes: int, max_vertices: int):
+        """
+        Builds meshes until max_meshes meshes or max_vertices vertices are built, returns True when the import is done.
+        Files are parsed and joined meshes built in one step, whatever their size.
+        """
+        meshes = 0
+        vertices = 0
+
+        while meshes < max_meshes and vertices < max_vertices:
+            if self.steps is None:
+                if self.done == self.total:
+                    self.finish()
+                    return True
+                if not self.next_file():
+                    return False
+
+            try:
+                vertices += next(self.steps)
+                meshes += 1
+            except StopIteration as e:
+                self.objects[self.steps_path] = e.value or []
+                self.steps = None
+                self.done += 1
+
+        return False
+
+    def finish(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+        add_instances(self.scx_paths, self.keys, self.objects)
+        if self.placements is not None:
+            place_objects(self.objects, self.placements)
+
+    def cancel(self):
+        # Objects built so far are kept, a file being built is left as far as it got
+        if self.steps is not None:
+            self.steps.close()
+            self.steps = None
+        if self.pool is not None:
+            self.stop_pool()
+
+def setup_flags(parallel_parsing = True, import_meshes = "BOTH", stream_meshes = False, instance_files = True, preview_mode = "NONE"):
+    global PARALLEL_PARSING
+    PARALLEL_PARSING = parallel_parsing
+    global IMPORT_MESHES
+    IMPORT_MESHES = import_meshes
+    global STREAM_MESHES
+    STREAM_MESHES = stream_meshes
+    global INSTANCE_FILES
+    INSTANCE_FILES = instance_files
+    global PREVIEW_MODE
+    PREVIEW_MODE = preview_mode
@@ -1,26 +1,24 @@
 import os
 
 import bpy
-from bpy.props import StringProperty, BoolProperty, CollectionProperty
+from bpy.props import StringProperty, BoolProperty, IntProperty, FloatProperty, EnumProperty, CollectionProperty
 from bpy.types import Operator
 from bpy_extras.io_utils import ImportHelper
 
-from .scx_import import scx_import
+from .scx_cache import setup_cache
+from .scx_catalog import scan_catalog, find_scx_files
+from .scx_import import ImportScheduler, scx_import, scx_import_placements, setup_flags as setup_flags_import
+from .scx_instances import read_placements
+from .scx_profile import begin as begin_profile, end as end_profile, short_summary
+from .scx_textures import setup_flags as setup_flags_textures
 from .scx_v3 import setup_flags as setup_flags_v3
 from .scx_v4 import setup_flags as setup_flags_v4
 
 empty_set = set()
+TIMER_STEP = 0.01 # Seconds between incremental import steps, Blender handles UI events in between
 
-class SCX_OT_import(Operator, ImportHelper):
-    bl_idname = 'import_mesh.scx'
-    bl_label = 'Import (.scx/.scy)'
-    bl_options = {'INTERNAL', 'UNDO'}
-
-    __doc__ = 'Load a SCX file'
-
-    filename_ext = '.scx'
-    filter_glob: StringProperty(default='*.scx;*.scy', options={'HIDDEN'})
-    files: CollectionProperty(type=bpy.types.PropertyGroup)
+class SCXImportOptions():
+    # Options shared by the import operators
 
     join_meshes: BoolProperty(
         default = False,
@@ -36,6 +34,13 @@ class SCX_OT_import(Operator, ImportHelper):
         description = "Don't use this. It's wrong. But if you know what you're doing, then please..."
     )
 
+    share_materials: BoolProperty(
+        default = True,
+        name = 'Share Identical Materials',
+        options = empty_set,
+        description = "Materials with the same colors, flags and textures use one Blender material, across meshes and files"
+    )
+
     skip_doubleside_faces: BoolProperty(
         default = True,
         name = 'Skip Double-side Faces',
@@ -43,24 +48,516 @@ class SCX_OT_import(Operator, ImportHelper):
         description = "I'm not sure we shouldn't skip such faces"
     )
 
+    weld_vertices: BoolProperty(
+        default = False,
+        name = 'Weld Vertices',
+        options = empty_set,
+        description = "Merge vertices split at UV and normal seams. UVs and colors are kept per face corner"
+    )
+
+    weld_distance: FloatProperty(
+        default = 0.0001,
+        min = 0.0000001,
+        name = 'Weld Distance',
+        options = empty_set,
+        subtype = 'DISTANCE',
+        precision = 5
+    )
+
+    import_bone_weights: BoolProperty(
+        default = True,
+        name = 'Import Bone Weights',
+        options = empty_set,
+        description = "Turn v4 bone weights into vertex groups named after the bone index"
+    )
+
+    import_meshes: EnumProperty(
+        default = 'BOTH',
+        name = 'Meshes',
+        options = empty_set,
+        items = (
+            ('BOTH', 'Render and Physics', "Physics meshes go to their own collection"),
+            ('RENDER', 'Render Only', "Skip v4 HardSurface meshes, their data isn't decoded at all"),
+            ('PHYSICS', 'Physics Only', "Only v4 HardSurface collision meshes, without materials or textures")
+        )
+    )
+
+    physics_proxy: EnumProperty(
+        default = 'NONE',
+        name = 'Physics Proxy',
+        options = empty_set,
+        items = (
+            ('NONE', 'None', "Keep physics meshes as they are"),
+            ('CONVEX', 'Convex Hull', "Replace every physics mesh with its convex hull"),
+            ('DECIMATE', 'Decimate', "Merge nearby vertices of physics meshes")
+        )
+    )
+
+    proxy_ratio: FloatProperty(
+        default = 0.25,
+        min = 0.01,
+        max = 1.0,
+        name = 'Proxy Ratio',
+        options = empty_set,
+        subtype = 'FACTOR',
+        description = "Share of vertices kept by decimated physics proxies"
+    )
+
+    preview_mode: EnumProperty(
+        default = 'NONE',
+        name = 'Preview',
+        options = empty_set,
+        items = (
+            ('NONE', 'Full Detail', "Build meshes with all attributes and materials"),
+            ('BOUNDS', 'Bounding Boxes', "One box per mesh, for laying out scenes. Load Full Detail replaces them later"),
+            ('DECIMATE', 'Decimated', "Merge nearby vertices, without UVs, colors or materials. Load Full Detail replaces them later")
+        )
+    )
+
+    preview_ratio: FloatProperty(
+        default = 0.1,
+        min = 0.01,
+        max = 1.0,
+        name = 'Preview Ratio',
+        options = empty_set,
+        subtype = 'FACTOR',
+        description = "Share of vertices kept by decimated previews"
+    )
+
+    stream_meshes: BoolProperty(
+        default = False,
+        name = 'Stream Meshes',
+        options = empty_set,
+        description = "Decode and build one mesh at a time to keep memory low on big track files. Doesn't use the parse cache or parallel parsing"
+    )
+
+    instance_files: BoolProperty(
+        default = True,
+        name = 'Instance Repeated Files',
+        options = empty_set,
+        description = "Files with the same content are built once, other occurrences become linked duplicates sharing mesh data"
+    )
+
+    use_cache: BoolProperty(
+        default = True,
+        name = 'Use Parse Cache',
+        options = empty_set,
+        description = "Keep parsed SCX data on disk, so importing the same unchanged file again skips parsing"
+    )
+
+    parallel_parsing: BoolProperty(
+        default = True,
+        name = 'Parallel Parsing',
+        options = empty_set,
+        description = "Parse selected files in background processes on all cores"
+    )
+
+    load_textures: BoolProperty(
+        default = True,
+        name = 'Load Textures',
+        options = empty_set,
+        description = "Find .tex entries next to the SCX file or in the texture directory and load them"
+    )
+
+    pack_textures: BoolProperty(
+        default = True,
+        name = 'Pack Textures',
+        options = empty_set,
+        description = "Read texture files in parallel and pack them into the .blend file"
+    )
+
+    texture_dir: StringProperty(
+        default = '',
+        name = 'Texture Directory',
+        options = empty_set,
+        subtype = 'DIR_PATH',
+        description = "Game directory to search for textures by file name. It's indexed once and the index is kept in the cache directory"
+    )
+
+    incremental_import: BoolProperty(
+        default = False,
+        name = 'Incremental Import',
+        options = empty_set,
+        description = "Build a few meshes at a time while Blender stays responsive, with a progress bar. Esc cancels and keeps what's built"
+    )
+
+    meshes_per_step: IntProperty(
+        default = 8,
+        min = 1,
+        name = 'Meshes per Step',
+        options = empty_set,
+        description = "Meshes built between UI updates"
+    )
+
+    vertices_per_step: IntProperty(
+        default = 200000,
+        min = 1,
+        name = 'Vertices per Step',
+        options = empty_set,
+        description = "Vertices built between UI updates, whichever limit comes first"
+    )
+
+    profile_import: BoolProperty(
+        default = False,
+        name = 'Profile Import',
+        options = empty_set,
+        description = "Time every import stage per file and mesh and print a summary to the console"
+    )
+
+    use_cprofile: BoolProperty(
+        default = False,
+        name = 'Use cProfile',
+        options = empty_set,
+        description = "Also run the Python profiler and print the slowest functions. Slows the import down"
+    )
+
+    profile_path: StringProperty(
+        default = '',
+        name = 'Profile JSON',
+        options = empty_set,
+        subtype = 'FILE_PATH',
+        description = "Write stage timings to this JSON file. cProfile stats go next to it as .prof"
+    )
+
+    def setup_import(self):
+        setup_flags_v3(self.join_meshes, self.re_use_materials, self.skip_doubleside_faces, self.share_materials, self.weld_vertices, self.weld_distance, self.preview_mode, self.preview_ratio)
+        setup_flags_v4(self.join_meshes, self.re_use_materials, self.skip_doubleside_faces, self.share_materials, self.weld_vertices, self.weld_distance, self.import_bone_weights, self.physics_proxy, self.proxy_ratio, self.preview_mode, self.preview_ratio)
+        setup_cache(self.use_cache)
+        setup_flags_textures(self.load_textures, self.pack_textures, bpy.path.abspath(self.texture_dir) if self.texture_dir else '')
+        setup_flags_import(self.parallel_parsing, self.import_meshes, self.stream_meshes, self.instance_files, self.preview_mode)
+
+        begin_profile(self.profile_import, self.use_cprofile)
+
+    def end_import(self):
+        stats = end_profile(bpy.path.abspath(self.profile_path) if self.profile_path else None)
+
+        if stats:
+            self.report({'INFO'}, f'SCX imported: {short_summary(stats)}')
+        else:
+            self.report({'INFO'}, f'SCX imported')
+
+    def run_import(self, context, scx_paths: list = None, placements: list = None):
+        # Either scx_paths or placements, see scx_import and scx_import_placements
+        self.setup_import()
+
+        # Modal operators don't run in background mode
+        if self.incremental_import and not bpy.app.background:
+            try:
+                self._scheduler = ImportScheduler(scx_paths, placements)
+            except Exception:
+                end_profile()
+                raise
+
+            wm = context.window_manager
+            self._timer = wm.event_timer_add(TIMER_STEP, window = context.window)
+            wm.progress_begin(0, max(self._scheduler.total, 1))
+            wm.modal_handler_add(self)
+            return {'RUNNING_MODAL'}
+
+        try:
+            if placements is None:
+                scx_import(scx_paths)
+            else:
+                scx_import_placements(placements)
+        except Exception:
+            end_profile()
+            raise
+
+        self.end_import()
+        return {'FINISHED'}
+
+    def end_modal(self, context):
+        if getattr(self, "_timer", None) is None:
+            return
+
+        wm = context.window_manager
+        wm.event_timer_remove(self._timer)
+        self._timer = None
+        self._scheduler = None
+        wm.progress_end()
+        context.workspace.status_text_set(None)
+
+    def modal(self, context, event):
+        scheduler = self._scheduler
+
+        # Objects built so far are kept and can be undone with the rest
+        if event.type == 'ESC':
+            scheduler.cancel()
+            self.end_modal(context)
+            end_profile()
+            self.report({'WARNING'}, f'SCX import cancelled, {scheduler.done} of {scheduler.total} files imported')
+            return {'FINISHED'}
+
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+
+        try:
+            finished = scheduler.step(self.meshes_per_step, self.vertices_per_step)
+        except Exception:
+            scheduler.cancel()
+            self.end_modal(context)
+            end_profile()
+            raise
+
+        if not finished:
+            context.window_manager.progress_update(scheduler.done)
+            context.workspace.status_text_set(f'Importing SCX: {scheduler.done} of {scheduler.total} files, Esc to cancel')
+            return {'RUNNING_MODAL'}
+
+        self.end_modal(context)
+        self.end_import()
+        return {'FINISHED'}
+
+    def cancel(self, context):
+        # Called by Blender when the modal import is stopped from outside, e.g. a file is loaded,
+        # and when the file browser is dismissed before anything started
+        scheduler = getattr(self, "_scheduler", None)
+        if scheduler is None:
+            return
+
+        scheduler.cancel()
+        self.end_modal(context)
+        end_profile()
+
+    def draw_options(self, layout):
+        layout.prop(self, 'join_meshes')
+        layout.prop(self, 're_use_materials')
+        layout.prop(self, 'share_materials')
+        layout.prop(self, 'skip_doubleside_faces')
+        layout.prop(self, 'weld_vertices')
+        row = layout.row()
+        row.enabled = self.weld_vertices
+        row.prop(self, 'weld_distance')
+        layout.prop(self, 'import_bone_weights')
+        layout.prop(self, 'import_meshes')
+        col = layout.column()
+        col.enabled = self.import_meshes != 'RENDER'
+        col.prop(self, 'physics_proxy')
+        row = col.row()
+        row.enabled = self.physics_proxy == 'DECIMATE'
+        row.prop(self, 'proxy_ratio')
+        layout.prop(self, 'preview_mode')
+        row = layout.row()
+        row.enabled = self.preview_mode == 'DECIMATE'
+        row.prop(self, 'preview_ratio')
+        layout.prop(self, 'stream_meshes')
+        layout.prop(self, 'instance_files')
+        layout.prop(self, 'use_cache')
+        layout.prop(self, 'parallel_parsing')
+        layout.prop(self, 'load_textures')
+        col = layout.column()
+        col.enabled = self.load_textures
+        col.prop(self, 'pack_textures')
+        col.prop(self, 'texture_dir')
+        layout.prop(self, 'incremental_import')
+        col = layout.column()
+        col.enabled = self.incremental_import
+        col.prop(self, 'meshes_per_step')
+        col.prop(self, 'vertices_per_step')
+        layout.prop(self, 'profile_import')
+        col = layout.column()
+        col.enabled = self.profile_import
+        col.prop(self, 'use_cprofile')
+        col.prop(self, 'profile_path')
+
+class SCX_OT_import(Operator, ImportHelper, SCXImportOptions):
+    bl_idname = 'import_mesh.scx'
+    bl_label = 'Import (.scx/.scy)'
+    bl_options = {'INTERNAL', 'UNDO'}
+
+    __doc__ = 'Load a SCX file'
+
+    filename_ext = '.scx'
+    filter_glob: StringProperty(default='*.scx;*.scy', options={'HIDDEN'})
+    files: CollectionProperty(type=bpy.types.PropertyGroup)
+
     def execute(self, context):
         dir = os.path.dirname(self.filepath)
         files = [os.path.join(dir, i.name) for j, i in enumerate(self.files)]
 
-        setup_flags_v3(self.join_meshes, self.re_use_materials, self.skip_doubleside_faces)
-        setup_flags_v4(self.join_meshes, self.re_use_materials, self.skip_doubleside_faces)
-        scx_import(files)
+        return self.run_import(context, files)
 
-        self.report({'INFO'}, f'SCX imported')
+    def draw(self, context):
+        self.draw_options(self.layout)
 
-        return {'FINISHED'}
+class SCX_OT_import_placements(Operator, ImportHelper, SCXImportOptions):
+    bl_idname = 'import_mesh.scx_placements'
+    bl_label = 'Import Placements (.json)'
+    bl_options = {'INTERNAL', 'UNDO'}
+
+    __doc__ = 'Load SCX files placed by a JSON list of paths and transforms'
+
+    filename_ext = '.json'
+    filter_glob: StringProperty(default='*.json', options={'HIDDEN'})
+
+    def execute(self, context):
+        try:
+            placements = read_placements(self.filepath)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            self.report({'ERROR'}, f'Placement file is invalid: {e}')
+            return {'CANCELLED'}
+
+        if not placements:
+            self.report({'WARNING'}, 'No placed SCX files found')
+            return {'CANCELLED'}
+
+        return self.run_import(context, placements = placements)
+
+    def draw(self, context):
+        self.draw_options(self.layout)
+
+class SCX_OT_import_catalog(Operator, SCXImportOptions):
+    bl_idname = 'import_mesh.scx_catalog'
+    bl_label = 'Import from Catalog'
+    bl_options = {'INTERNAL', 'UNDO'}
+
+    __doc__ = 'Scan a game directory into the SCX catalog and import the files matching the filters'
+
+    directory: StringProperty(subtype='DIR_PATH')
+    filter_folder: BoolProperty(default=True, options={'HIDDEN'})
+
+    rescan: BoolProperty(
+        default = True,
+        name = 'Rescan Directory',
+        options = empty_set,
+        description = "Update the catalog first. Only new and changed files are read, and only their headers"
+    )
+
+    material_filter: StringProperty(
+        default = '',
+        name = 'Material',
+        options = empty_set,
+        description = "Files with a mesh using a matching material name. * and ? are wildcards, otherwise any name containing it matches"
+    )
+
+    texture_filter: StringProperty(
+        default = '',
+        name = 'Texture',
+        options = empty_set,
+        description = "Files whose .tex list has a matching texture. * and ? are wildcards, otherwise any name containing it matches"
+    )
+
+    min_vertices: IntProperty(
+        default = 0,
+        min = 0,
+        name = 'Min Vertices',
+        options = empty_set,
+        description = "Files with at least this many vertices in all meshes"
+    )
+
+    version_filter: EnumProperty(
+        default = 'ANY',
+        name = 'Version',
+        options = empty_set,
+        items = (
+            ('ANY', 'Any', ""),
+            ('3', 'v3', ""),
+            ('4', 'v4', "")
+        )
+    )
+
+    max_files: IntProperty(
+        default = 100,
+        min = 0,
+        name = 'Max Files',
+        options = empty_set,
+        description = "Import at most this many of the matching files, 0 for all"
+    )
+
+    def invoke(self, context, event):
+        context.window_manager.fileselect_add(self)
+        return {'RUNNING_MODAL'}
+
+    def execute(self, context):
+        directory = bpy.path.abspath(self.directory)
+
+        if self.rescan:
+            stats = scan_catalog(directory)
+            print(f"SCX catalog: {stats}")
+
+        files = find_scx_files(
+            directory,
+            self.material_filter or None,
+            self.texture_filter or None,
+            self.min_vertices,
+            None if self.version_filter == 'ANY' else int(self.version_filter),
+            "physics" if self.import_meshes == 'PHYSICS' else None
+        )
+
+        if not files:
+            self.report({'WARNING'}, 'No cataloged SCX files match the filters')
+            return {'CANCELLED'}
+
+        if self.max_files and len(files) > self.max_files:
+            self.report({'WARNING'}, f'{len(files)} files match, importing the first {self.max_files}')
+            files = files[:self.max_files]
+
+        return self.run_import(context, files)
 
     def draw(self, context):
         layout = self.layout
-        layout.prop(self, 'join_meshes')
-        layout.prop(self, 're_use_materials')
-        layout.prop(self, 'skip_doubleside_faces')
+        layout.prop(self, 'rescan')
+        layout.prop(self, 'material_filter')
+        layout.prop(self, 'texture_filter')
+        layout.prop(self, 'min_vertices')
+        layout.prop(self, 'version_filter')
+        layout.prop(self, 'max_files')
+        layout.separator()
+        self.draw_options(layout)
+
+class SCX_OT_load_full_detail(Operator, SCXImportOptions):
+    bl_idname = 'object.scx_load_full_detail'
+    bl_label = 'Load SCX Full Detail'
+    bl_options = {'REGISTER', 'UNDO'}
+
+    __doc__ = 'Replace selected SCX previews with their full detail meshes and materials'
+
+    @staticmethod
+    def preview_roots(objects):
+        roots = []
+        for bpy_obj in objects:
+            while bpy_obj.parent is not None and "scx_path" not in bpy_obj:
+                bpy_obj = bpy_obj.parent
+            if bpy_obj.get("scx_preview") and bpy_obj not in roots:
+                roots.append(bpy_obj)
+        return roots
+
+    @classmethod
+    def poll(cls, context):
+        return bool(cls.preview_roots(context.selected_objects))
+
+    def execute(self, context):
+        roots = []
+        for bpy_obj in self.preview_roots(context.selected_objects):
+            if os.path.isfile(bpy_obj["scx_path"]):
+                roots.append(bpy_obj)
+            else:
+                self.report({'WARNING'}, f'{bpy_obj["scx_path"]} not found, kept the preview')
+
+        # Joined render and physics objects of one file share a path and a transform
+        placements = {}
+        for bpy_obj in roots:
+            matrix = bpy_obj.matrix_world.copy()
+            key = (bpy_obj["scx_path"], tuple(round(x, 6) for row in matrix for x in row))
+            placements.setdefault(key, (bpy_obj["scx_path"], matrix))
+
+        if not placements:
+            return {'CANCELLED'}
+
+        # Previews are removed right away, so it isn't cancellable
+        self.preview_mode = 'NONE'
+        self.incremental_import = False
+        result = self.run_import(context, placements = list(placements.values()))
+
+        bpy.data.batch_remove([x for bpy_obj in roots for x in (bpy_obj, *bpy_obj.children_recursive)])
+        return result
+
+    def draw(self, context):
+        self.draw_options(self.layout)
 
 classes = (
     SCX_OT_import,
+    SCX_OT_import_placements,
+    SCX_OT_import_catalog,
+    SCX_OT_load_full_detail,
 )
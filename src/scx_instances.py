@@ -0,0 +1,106 @@
+import hashlib
+import json
+import os
+from collections import Counter
+
+import bpy
+from mathutils import Euler, Matrix, Vector
+
+"""
+Instancing of repeated SCX files and placement lists.
+Files with the same content (SCX and .tex bytes) are built once, other occurrences are linked duplicates sharing mesh data.
+"""
+
+HASH_BLOCK_SIZE = 1024 * 1024
+HASHES = {} # (path, size, mtime) to content hash
+
+def hash_file(digest, path: str):
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(HASH_BLOCK_SIZE)
+            if not block:
+                break
+            digest.update(block)
+
+def content_key(scx_path: str):
+    scx_path = os.path.abspath(scx_path)
+    tex_path = os.path.splitext(scx_path)[0] + ".tex"
+    stat = os.stat(scx_path)
+    tex_mtime = os.stat(tex_path).st_mtime_ns if os.path.isfile(tex_path) else 0
+
+    stamp = (scx_path, stat.st_size, stat.st_mtime_ns, tex_mtime)
+    if stamp in HASHES:
+        return HASHES[stamp]
+
+    # Textures come from the .tex list, equal SCX files with other textures aren't instances
+    digest = hashlib.sha1()
+    hash_file(digest, scx_path)
+    digest.update(b"\x00")
+    if tex_mtime:
+        hash_file(digest, tex_path)
+
+    HASHES[stamp] = digest.hexdigest()
+    return HASHES[stamp]
+
+def file_sizes(scx_path: str):
+    tex_path = os.path.splitext(scx_path)[0] + ".tex"
+    return os.path.getsize(scx_path), os.path.getsize(tex_path) if os.path.isfile(tex_path) else -1
+
+def content_keys(scx_paths: list):
+    # Only files sharing their SCX and .tex sizes with another file are hashed, the others are keyed by path
+    sizes = {scx_path: file_sizes(scx_path) for scx_path in scx_paths}
+    counts = Counter(sizes.values())
+    return {
+        scx_path: content_key(scx_path) if counts[sizes[scx_path]] > 1 else os.path.abspath(scx_path)
+        for scx_path in scx_paths
+    }
+
+def duplicate_object(bpy_obj: bpy.types.Object, parent: bpy.types.Object = None, linked: bool = True):
+    copy = bpy_obj.copy()
+    if not linked and bpy_obj.data is not None:
+        copy.data = bpy_obj.data.copy()
+
+    for collection in bpy_obj.users_collection:
+        collection.objects.link(copy)
+    if parent is not None:
+        copy.parent = parent
+
+    for child in bpy_obj.children:
+        duplicate_object(child, copy, linked)
+
+    return copy
+
+def duplicate_objects(roots: list, linked: bool = True):
+    # Children are duplicated with their parents, linked duplicates share mesh data and materials
+    return [duplicate_object(bpy_obj, None, linked) for bpy_obj in roots]
+
+def placement_matrix(entry: dict):
+    if "matrix" in entry:
+        return Matrix(entry["matrix"])
+
+    return Matrix.LocRotScale(
+        Vector(entry.get("location", (0, 0, 0))),
+        Euler(entry.get("rotation", (0, 0, 0))),
+        Vector(entry.get("scale", (1, 1, 1)))
+    )
+
+def read_placements(json_path: str):
+    """
+    Placement files are JSON lists of {"path", "location", "rotation", "scale"} or {"path", "matrix"} entries.
+    Paths are relative to the placement file, rotation is XYZ Euler in radians, matrix is 4x4 row-major.
+    Returns (scx_path, matrix) pairs, entries with missing files are skipped.
+    """
+    with open(json_path, "rt", encoding = "utf-8") as f:
+        entries = json.load(f)
+
+    root = os.path.dirname(os.path.abspath(json_path))
+    placements = []
+
+    for entry in entries:
+        scx_path = os.path.normpath(os.path.join(root, entry["path"]))
+        if not os.path.isfile(scx_path):
+            print(f"Placement skipped, file not found: {scx_path}")
+            continue
+        placements.append((scx_path, placement_matrix(entry)))
+
+    return placements
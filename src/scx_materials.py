@@ -0,0 +1,77 @@
+import hashlib
+import json
+
+"""
+Content-hashed material sharing.
+Identical decoded materials, with texture indices resolved through the .tex list, map to one Blender material.
+Callers pass .tex lists with entries resolved to files on disk where found, see scx_textures.resolved_tex_list.
+"""
+
+SHARED_MATERIALS = {}
+
+def resolve_texture(index: int, tex_list: list, material_name: str):
+    if len(tex_list) > index:
+        return tex_list[index]
+    # Unresolved textures are named after the material, see get_material_texture
+    return f"{material_name}_0x{index:08X}".lower()
+
+def resolve_value(key: str, value, tex_list: list, material_name: str):
+    if isinstance(value, dict):
+        value = {k: resolve_value(k, v, tex_list, material_name) for k, v in value.items()}
+        if "index" in value:
+            value["index"] = resolve_texture(value["index"], tex_list, material_name)
+        return value
+    elif isinstance(value, (list, tuple)):
+        return [resolve_value(key, v, tex_list, material_name) for v in value]
+    elif isinstance(value, float):
+        return round(value, 6)
+    elif key.endswith("MapIndex") and value != 0xFFFF:
+        return resolve_texture(value, tex_list, material_name)
+    elif hasattr(value, "__int__") and not isinstance(value, (bool, int)):
+        return int(value)
+    return value
+
+def material_hash(material_data: dict, tex_list: list):
+    material_name = material_data.get("name", "")
+    key = {k: resolve_value(k, v, tex_list, material_name) for k, v in material_data.items() if k != "name"}
+    return hashlib.sha1(json.dumps(key, sort_keys = True).encode("utf-8")).hexdigest()
+
+def get_shared_material(digest: str, materials):
+    # Names, not references, are kept since undo invalidates ID pointers
+    material_node = materials.get(SHARED_MATERIALS.get(digest, ""))
+    if material_node and material_node.get("scx_hash") == digest:
+        return material_node
+
+    SHARED_MATERIALS.pop(digest, None)
+    return None
+
+def store_shared_material(digest: str, material_node):
+    SHARED_MATERIALS[digest] = material_node.name
+    material_node["scx_hash"] = digest
+
+def clear_shared_materials():
+    SHARED_MATERIALS.clear()
+
+def material_to_json(material_data: dict, tex_list: list):
+    # Texture indices are stored resolved, so the material can be written with another .tex list
+    material_name = material_data.get("name", "")
+    return json.dumps({k: resolve_value(k, v, tex_list, material_name) for k, v in material_data.items()})
+
+def assign_texture(path: str, tex_list: list):
+    if path not in tex_list:
+        tex_list.append(path)
+    return tex_list.index(path)
+
+def assign_value(key: str, value, tex_list: list):
+    if isinstance(value, dict):
+        value = {k: assign_value(k, v, tex_list) for k, v in value.items()}
+        if isinstance(value.get("index"), str):
+            value["index"] = assign_texture(value["index"], tex_list)
+        return value
+    elif key.endswith("MapIndex") and isinstance(value, str):
+        return assign_texture(value, tex_list)
+    return value
+
+def material_from_json(material_json: str, tex_list: list):
+    material_data = json.loads(material_json)
+    return {k: assign_value(k, v, tex_list) for k, v in material_data.items()}
@@ -0,0 +1,121 @@
+import bmesh
+import bpy
+import numpy as np
+
+from .scx_common import join_meshes, cluster_to_count
+
+"""
+Bulk mesh construction with foreach_set.
+Triangles and loop attribute corners are expected to come from scx_common.prepare_triangles.
+"""
+
+def fill_mesh(bpy_mesh: bpy.types.Mesh, positions: np.ndarray, triangles: np.ndarray, material_indices: np.ndarray = None):
+    vertex_count = len(positions)
+    triangle_count = len(triangles)
+
+    bpy_mesh.vertices.add(vertex_count)
+    bpy_mesh.vertices.foreach_set("co", np.ascontiguousarray(positions, dtype = np.float32).ravel())
+
+    bpy_mesh.loops.add(triangle_count * 3)
+    bpy_mesh.loops.foreach_set("vertex_index", np.ascontiguousarray(triangles, dtype = np.int32).ravel())
+
+    bpy_mesh.polygons.add(triangle_count)
+    bpy_mesh.polygons.foreach_set("loop_start", np.arange(0, triangle_count * 3, 3, dtype = np.int32))
+    if bpy.app.version < (4, 0, 0):
+        bpy_mesh.polygons.foreach_set("loop_total", np.full(triangle_count, 3, dtype = np.int32))
+    bpy_mesh.polygons.foreach_set("use_smooth", np.ones(triangle_count, dtype = bool))
+    if material_indices is not None:
+        bpy_mesh.polygons.foreach_set("material_index", np.ascontiguousarray(material_indices, dtype = np.int32))
+
+    bpy_mesh.update(calc_edges = True)
+
+def corner_values(values: np.ndarray, corners: np.ndarray = None):
+    # Without corners values are already per corner
+    if corners is not None:
+        values = values[corners.ravel()]
+    return np.ascontiguousarray(values, dtype = np.float32).ravel()
+
+def add_uv_layer(bpy_mesh: bpy.types.Mesh, name: str, uvs: np.ndarray, corners: np.ndarray = None):
+    uv_layer = bpy_mesh.uv_layers.new(name = name)
+    uv_layer.data.foreach_set("uv", corner_values(uvs, corners))
+    return uv_layer
+
+def add_color_attribute(bpy_mesh: bpy.types.Mesh, name: str, colors: np.ndarray, corners: np.ndarray = None):
+    color_attribute = bpy_mesh.color_attributes.new(name, "BYTE_COLOR", "CORNER")
+    # Raw values, same as BMesh loop color layers
+    color_attribute.data.foreach_set("color_srgb", corner_values(colors, corners))
+    return color_attribute
+
+def add_attributes(bpy_mesh: bpy.types.Mesh, attributes: dict, corners: np.ndarray = None):
+    # UV1-3 become UV layers, everything else color attributes
+    for name, values in attributes.items():
+        if name.startswith("UV"):
+            add_uv_layer(bpy_mesh, name, values, corners)
+        else:
+            add_color_attribute(bpy_mesh, name, values, corners)
+
+HULL_MAX_POINTS = 4096 # Denser meshes are clustered first, BMesh vertices are created one by one
+
+def convex_hull(positions: np.ndarray):
+    if len(positions) > HULL_MAX_POINTS:
+        positions, _ = cluster_to_count(positions, HULL_MAX_POINTS)
+
+    bm = bmesh.new()
+    try:
+        for position in positions.tolist():
+            bm.verts.new(position)
+
+        result = bmesh.ops.convex_hull(bm, input = bm.verts[:])
+        bmesh.ops.delete(bm, geom = result["geom_interior"] + result["geom_unused"], context = "VERTS")
+        bmesh.ops.triangulate(bm, faces = bm.faces[:])
+        bm.verts.index_update()
+
+        hull_positions = np.array([v.co[:] for v in bm.verts], dtype = np.float32).reshape(-1, 3)
+        triangles = np.array([[v.index for v in face.verts] for face in bm.faces], dtype = np.int32).reshape(-1, 3)
+    finally:
+        bm.free()
+
+    return hull_positions, triangles
+
+def get_collection(name: str):
+    scene_collection = bpy.context.scene.collection
+    collection = bpy.data.collections.get(name)
+
+    if collection is None:
+        collection = bpy.data.collections.new(name)
+    if scene_collection.children.get(collection.name) is None:
+        scene_collection.children.link(collection)
+
+    return collection
+
+WEIGHT_STEPS = 1024 # Weights are rounded to this many steps, one VertexGroup.add call per step
+
+def add_vertex_groups(bpy_obj: bpy.types.Object, groups: dict):
+    # VertexGroup.add only takes one weight for a list of vertices, so vertices are batched by weight
+    for name, (vertices, weights) in groups.items():
+        vertex_group = bpy_obj.vertex_groups.get(name) or bpy_obj.vertex_groups.new(name = name)
+
+        steps = np.round(weights * WEIGHT_STEPS).astype(np.int32)
+        order = np.argsort(steps, kind = "stable")
+        unique_steps, starts = np.unique(steps[order], return_index = True)
+
+        for step, step_vertices in zip(unique_steps, np.split(vertices[order], starts[1:])):
+            if step > 0:
+                vertex_group.add(step_vertices.tolist(), step / WEIGHT_STEPS, "REPLACE")
+
+def build_joined_mesh(name: str, meshes: list, materials: list, collection: bpy.types.Collection = None):
+    # One object with a material slot per material, see scx_common.join_meshes for the items of meshes
+    bpy_mesh = bpy.data.meshes.new(name)
+    bpy_obj = bpy.data.objects.new(name, bpy_mesh)
+    (collection or bpy.context.scene.collection).objects.link(bpy_obj)
+
+    if meshes:
+        positions, triangles, attributes, material_indices, groups = join_meshes(meshes)
+        fill_mesh(bpy_mesh, positions, triangles, material_indices)
+        add_attributes(bpy_mesh, attributes)
+        add_vertex_groups(bpy_obj, groups)
+
+    for material in materials:
+        bpy_mesh.materials.append(material)
+
+    return bpy_obj
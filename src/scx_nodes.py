@@ -0,0 +1,215 @@
+import bpy
+
+"""
+Shared shader node group for SCX materials.
+The group is built once per .blend file, every material only adds an instance of it and its image nodes.
+Missing maps are left unlinked, group input defaults make them neutral.
+"""
+
+NODE_GROUP_NAME = "SCX Material"
+NODE_GROUP_VERSION = 1 # Bump when the group changes, older groups are renamed and left for existing materials
+
+# name, socket type, default
+NODE_GROUP_INPUTS = [
+    ("Diffuse Color", "NodeSocketColor", (1, 1, 1, 1)),
+    ("Opacity", "NodeSocketFloat", 1.0),
+    ("Diffuse Map", "NodeSocketColor", (1, 1, 1, 1)),
+    ("Diffuse Alpha", "NodeSocketFloat", 1.0),
+    ("Mix Second", "NodeSocketColor", (1, 1, 1, 1)),
+    ("Specular Intensity", "NodeSocketFloat", 0.0),
+    ("Bump Map", "NodeSocketColor", (0.5, 0.5, 0.5, 1)),
+    ("Bump Strength", "NodeSocketFloat", 0.0),
+    ("Reflection Map", "NodeSocketColor", (0, 0, 0, 1)),
+    ("Reflection Intensity", "NodeSocketFloat", 0.0),
+    ("Emissive Color", "NodeSocketColor", (0, 0, 0, 1)),
+    ("Emissive Map", "NodeSocketColor", (1, 1, 1, 1))
+]
+
+# Map key to group input and group input of the map alpha
+MAP_INPUTS = {
+    "Diffuse": ("Diffuse Map", "Diffuse Alpha"),
+    "MixSecond": ("Mix Second", None),
+    "Bump": ("Bump Map", None),
+    "Reflection": ("Reflection Map", None),
+    "Emissive": ("Emissive Map", None)
+}
+
+# SCX4MapTillingFlags to image extension, unknown flags tile
+TILLING_EXTENSIONS = {
+    0x0: "MIRROR", # UMirrorVMirror
+    0x3: "REPEAT" # UTileVTile
+}
+
+def new_socket(group: bpy.types.NodeTree, name: str, in_out: str, socket_type: str, default = None):
+    if bpy.app.version >= (4, 0, 0):
+        socket = group.interface.new_socket(name, in_out = in_out, socket_type = socket_type)
+    elif in_out == "INPUT":
+        socket = group.inputs.new(socket_type, name)
+    else:
+        socket = group.outputs.new(socket_type, name)
+
+    if default is not None:
+        socket.default_value = default
+    return socket
+
+def find_input(node: bpy.types.Node, *names: str):
+    # Principled BSDF inputs were renamed in Blender 4.0
+    for name in names:
+        socket = node.inputs.get(name)
+        if socket is not None:
+            return socket
+    return None
+
+def vector_math(nodes, operation: str, location: tuple):
+    node = nodes.new("ShaderNodeVectorMath")
+    node.operation = operation
+    node.location = location
+    return node
+
+def build_node_group():
+    group = bpy.data.node_groups.new(NODE_GROUP_NAME, "ShaderNodeTree")
+    group["scx_version"] = NODE_GROUP_VERSION
+
+    for name, socket_type, default in NODE_GROUP_INPUTS:
+        new_socket(group, name, "INPUT", socket_type, default)
+    new_socket(group, "Shader", "OUTPUT", "NodeSocketShader")
+
+    nodes = group.nodes
+    links = group.links
+
+    group_input = nodes.new("NodeGroupInput")
+    group_input.location = (-800, 0)
+    group_output = nodes.new("NodeGroupOutput")
+    group_output.location = (400, 0)
+    inputs = group_input.outputs
+
+    # Base color = diffuse color * diffuse map * mix second
+    diffuse = vector_math(nodes, "MULTIPLY", (-500, 300))
+    links.new(inputs["Diffuse Color"], diffuse.inputs[0])
+    links.new(inputs["Diffuse Map"], diffuse.inputs[1])
+    mix_second = vector_math(nodes, "MULTIPLY", (-300, 300))
+    links.new(diffuse.outputs["Vector"], mix_second.inputs[0])
+    links.new(inputs["Mix Second"], mix_second.inputs[1])
+
+    alpha = nodes.new("ShaderNodeMath")
+    alpha.operation = "MULTIPLY"
+    alpha.location = (-300, 100)
+    links.new(inputs["Opacity"], alpha.inputs[0])
+    links.new(inputs["Diffuse Alpha"], alpha.inputs[1])
+
+    bump = nodes.new("ShaderNodeBump")
+    bump.location = (-300, -100)
+    links.new(inputs["Bump Strength"], bump.inputs["Strength"])
+    links.new(inputs["Bump Map"], bump.inputs["Height"])
+
+    # Reflection is added on top like an environment map in game
+    emissive = vector_math(nodes, "MULTIPLY", (-500, -300))
+    links.new(inputs["Emissive Color"], emissive.inputs[0])
+    links.new(inputs["Emissive Map"], emissive.inputs[1])
+    reflection = vector_math(nodes, "SCALE", (-500, -500))
+    links.new(inputs["Reflection Map"], reflection.inputs[0])
+    links.new(inputs["Reflection Intensity"], reflection.inputs["Scale"])
+    emission = vector_math(nodes, "ADD", (-300, -400))
+    links.new(emissive.outputs["Vector"], emission.inputs[0])
+    links.new(reflection.outputs["Vector"], emission.inputs[1])
+
+    bsdf = nodes.new("ShaderNodeBsdfPrincipled")
+    bsdf.location = (0, 0)
+    bsdf.inputs["Metallic"].default_value = 0
+    bsdf.inputs["Roughness"].default_value = 0
+    find_input(bsdf, "Emission Strength").default_value = 1
+    links.new(mix_second.outputs["Vector"], bsdf.inputs["Base Color"])
+    links.new(alpha.outputs["Value"], bsdf.inputs["Alpha"])
+    links.new(bump.outputs["Normal"], bsdf.inputs["Normal"])
+    links.new(inputs["Specular Intensity"], find_input(bsdf, "Specular IOR Level", "Specular"))
+    links.new(emission.outputs["Vector"], find_input(bsdf, "Emission Color", "Emission"))
+
+    links.new(bsdf.outputs["BSDF"], group_output.inputs["Shader"])
+
+    return group
+
+def get_node_group():
+    group = bpy.data.node_groups.get(NODE_GROUP_NAME)
+    if group and group.get("scx_version") == NODE_GROUP_VERSION:
+        return group
+
+    if group:
+        group.name = f"{NODE_GROUP_NAME} (v{group.get('scx_version', 0)})"
+    return build_node_group()
+
+def build_material_nodes(material_node: bpy.types.Material, values: dict, maps: dict):
+    """
+    values are group input values by name.
+    maps are by MAP_INPUTS key, each with "image", "channel" (UV layer index), "tilling", "offset" and "tilling_flag".
+    """
+    material_node.use_nodes = True
+    nodes = material_node.node_tree.nodes
+    links = material_node.node_tree.links
+
+    for node in [x for x in nodes if x.type != "OUTPUT_MATERIAL"]:
+        nodes.remove(node)
+
+    output = next((x for x in nodes if x.type == "OUTPUT_MATERIAL"), None) or nodes.new("ShaderNodeOutputMaterial")
+    output.location = (300, 0)
+
+    group_node = nodes.new("ShaderNodeGroup")
+    group_node.node_tree = get_node_group()
+    group_node.location = (0, 0)
+    links.new(group_node.outputs["Shader"], output.inputs["Surface"])
+
+    for name, value in values.items():
+        group_node.inputs[name].default_value = value
+
+    uv_nodes = {}
+    coordinates = None
+
+    for i, (key, map_data) in enumerate(maps.items()):
+        color_input, alpha_input = MAP_INPUTS[key]
+        y = 300 - i * 300
+
+        image_node = nodes.new("ShaderNodeTexImage")
+        image_node.name = color_input
+        image_node.label = color_input
+        image_node.location = (-300, y)
+        image_node.interpolation = "Cubic"
+        image_node.extension = TILLING_EXTENSIONS.get(map_data.get("tilling_flag", 0x3), "REPEAT")
+        image_node.image = map_data["image"]
+
+        links.new(image_node.outputs["Color"], group_node.inputs[color_input])
+        if alpha_input:
+            links.new(image_node.outputs["Alpha"], group_node.inputs[alpha_input])
+
+        if key == "Reflection":
+            if coordinates is None:
+                coordinates = nodes.new("ShaderNodeTexCoord")
+                coordinates.location = (-800, y)
+            links.new(coordinates.outputs["Reflection"], image_node.inputs["Vector"])
+            continue
+
+        channel = map_data.get("channel", 0)
+        tilling = map_data.get("tilling", [1, 1])
+        offset = map_data.get("offset", [0, 0])
+        mapped = list(tilling) != [1, 1] or list(offset) != [0, 0]
+
+        # Image nodes use the first UV layer on their own
+        if channel == 0 and not mapped:
+            continue
+
+        if channel not in uv_nodes:
+            uv_node = nodes.new("ShaderNodeUVMap")
+            uv_node.uv_map = f"UV{channel + 1}"
+            uv_node.location = (-800, y)
+            uv_nodes[channel] = uv_node
+        vector = uv_nodes[channel].outputs["UV"]
+
+        if mapped:
+            mapping = nodes.new("ShaderNodeMapping")
+            mapping.location = (-550, y)
+            mapping.inputs["Location"].default_value = (offset[0], offset[1], 0)
+            mapping.inputs["Scale"].default_value = (tilling[0], tilling[1], 1)
+            links.new(vector, mapping.inputs["Vector"])
+            vector = mapping.outputs["Vector"]
+
+        links.new(vector, image_node.inputs["Vector"])
+
+    return group_node
@@ -0,0 +1,129 @@
+import cProfile
+import io
+import json
+import pstats
+import time
+
+"""
+Import instrumentation, off by default.
+Stages record wall time and an item count (vertices, corners, bytes...) per file and mesh.
+"""
+
+ENABLED = False
+PROFILER: cProfile.Profile = None
+RECORDS = []
+
+class Stage():
+    def __init__(self, name: str, file: str = None, mesh: str = None, count: int = 0):
+        self.name = name
+        self.file = file
+        self.mesh = mesh
+        self.count = count
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, type, value, traceback):
+        record(self.name, time.perf_counter() - self.start, self.file, self.mesh, self.count)
+
+class NullStage():
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        pass
+
+NULL_STAGE = NullStage()
+
+def stage(name: str, file: str = None, mesh: str = None, count: int = 0):
+    if ENABLED:
+        return Stage(name, file, mesh, count)
+    return NULL_STAGE
+
+def record(name: str, seconds: float, file: str = None, mesh: str = None, count: int = 0):
+    if ENABLED:
+        RECORDS.append({"stage": name, "file": file, "mesh": mesh, "seconds": seconds, "count": int(count)})
+
+def log(*args):
+    if ENABLED:
+        print(*args)
+
+def timed_call(function, *args):
+    # For worker processes, time is measured there and recorded by the caller
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+def timed_iter(iterable, name: str, file: str = None):
+    # Streamed meshes are decoded while iterating, that time goes to its own stage
+    if not ENABLED:
+        yield from iterable
+        return
+
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        record(name, time.perf_counter() - start, file)
+        yield item
+        del item
+
+def begin(enabled = False, use_cprofile = False):
+    global ENABLED
+    ENABLED = enabled
+    RECORDS.clear()
+
+    global PROFILER
+    PROFILER = None
+    if enabled and use_cprofile:
+        PROFILER = cProfile.Profile()
+        PROFILER.enable()
+
+def end(json_path: str = None):
+    global ENABLED
+    if not ENABLED:
+        return None
+
+    profile_text = None
+    if PROFILER:
+        PROFILER.disable()
+        stream = io.StringIO()
+        pstats.Stats(PROFILER, stream = stream).sort_stats("cumulative").print_stats(25)
+        profile_text = stream.getvalue()
+        if json_path:
+            PROFILER.dump_stats(json_path + ".prof")
+
+    stats = summary()
+
+    if json_path:
+        with open(json_path, "wt", encoding = "utf-8") as f:
+            json.dump({"stages": stats, "records": RECORDS}, f, indent = 2)
+
+    print(format_summary(stats))
+    if profile_text:
+        print(profile_text)
+
+    ENABLED = False
+    return stats
+
+def summary():
+    stages = {}
+    for x in RECORDS:
+        stage_stats = stages.setdefault(x["stage"], {"seconds": 0.0, "calls": 0, "count": 0})
+        stage_stats["seconds"] += x["seconds"]
+        stage_stats["calls"] += 1
+        stage_stats["count"] += x["count"]
+    return stages
+
+def format_summary(stats: dict):
+    lines = [f"{'stage':<16} {'seconds':>9} {'calls':>7} {'count':>10}"]
+    for name, stage_stats in sorted(stats.items(), key = lambda x: -x[1]["seconds"]):
+        lines.append(f"{name:<16} {stage_stats['seconds']:9.3f} {stage_stats['calls']:>7} {stage_stats['count']:>10}")
+    return "\n".join(lines)
+
+def short_summary(stats: dict):
+    return ", ".join(f"{name} {stage_stats['seconds']:.2f}s" for name, stage_stats in sorted(stats.items(), key = lambda x: -x[1]["seconds"])[:4])
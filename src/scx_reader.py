@@ -0,0 +1,141 @@
+import os
+
+from . import scx_cache
+from .BinaryReader import BinaryReader
+from .scx_v3_reader import (
+    read_scx_data as read_scx_data_v3,
+    read_mesh_list as read_mesh_list_v3,
+    iter_scx_meshes as iter_scx_meshes_v3
+)
+from .scx_v4_reader import (
+    read_scx_data as read_scx_data_v4,
+    read_mesh_list as read_mesh_list_v4,
+    iter_scx_meshes as iter_scx_meshes_v4
+)
+
+TEX_ENCODINGS = ["utf-8", "cp1251"] # Tried in order, utf-8 is strict so a failure means it's the game's cp1251
+TEX_LISTS = {} # .tex path to ((mtime, size), texture list)
+
+def parse_tex_list(data: bytes):
+    # First word of every line up to the first empty one, "a>>>>>b" redirects to b
+    names = []
+    for line in data.split(b"\n"):
+        words = line.split(maxsplit = 1)
+        if len(words) == 0:
+            break
+        names.append(words[0].split(b">>>>>", 1)[-1])
+    return names
+
+def decode_tex_list(names: list):
+    # Decoded at once, so the encoding is detected with a single pass
+    data = b"\n".join(names)
+
+    for encoding in TEX_ENCODINGS:
+        try:
+            text = data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+        return text.split("\n") if names else []
+
+    return []
+
+def read_tex_list(scx_path: str):
+    tex_path = os.path.splitext(scx_path)[0] + ".tex"
+
+    try:
+        stat = os.stat(tex_path)
+    except OSError:
+        return []
+
+    key = (stat.st_mtime_ns, stat.st_size)
+    cached = TEX_LISTS.get(tex_path)
+    if cached and cached[0] == key:
+        return list(cached[1])
+
+    try:
+        with open(tex_path, "rb") as tex:
+            data = tex.read()
+    except OSError:
+        return []
+
+    tex_list = decode_tex_list(parse_tex_list(data))
+    TEX_LISTS[tex_path] = (key, tex_list)
+    return list(tex_list)
+
+def filter_meshes(scx_data: dict, kinds = None):
+    if scx_data and kinds:
+        scx_data = dict(scx_data)
+        scx_data["meshes"] = [mesh_data for mesh_data in scx_data["meshes"] if mesh_data.get("kind", "render") in kinds]
+    return scx_data
+
+def read_scx_data(scx_path: str, kinds = None):
+    scx_data = scx_cache.load(scx_path)
+    if scx_data:
+        return filter_meshes(scx_data, kinds)
+
+    # Only requested meshes are decoded, such partial data isn't cached
+    if kinds:
+        return parse_scx_data(scx_path, kinds)
+
+    scx_data = parse_scx_data(scx_path)
+    scx_cache.save(scx_path, scx_data)
+
+    return scx_data
+
+def open_scx(scx: BinaryReader):
+    signature = scx.ReadSizedString(4)
+    if signature != "INVO":
+        print("not invictus object")
+        return
+
+    version = scx.ReadUInt32()
+    if version not in (3, 4):
+        print(f"SCX v{version} not supported")
+        return
+
+    return version
+
+def parse_scx_data(scx_path: str, kinds = None):
+    with BinaryReader(scx_path, mapped = True) as scx:
+        version = open_scx(scx)
+        if version == 3:
+            return filter_meshes(read_scx_data_v3(scx), kinds)
+        elif version == 4:
+            return read_scx_data_v4(scx, kinds)
+
+def list_scx_meshes(scx_path: str):
+    with BinaryReader(scx_path, mapped = True) as scx:
+        version = open_scx(scx)
+        if version == 3:
+            return read_mesh_list_v3(scx)
+        elif version == 4:
+            return read_mesh_list_v4(scx)
+
+def iter_scx_meshes(scx: BinaryReader, version: int, kinds = None):
+    with scx:
+        if version == 3:
+            meshes = iter_scx_meshes_v3(scx)
+        else:
+            meshes = iter_scx_meshes_v4(scx, kinds)
+
+        for mesh_data in meshes:
+            if not kinds or mesh_data["kind"] in kinds:
+                yield mesh_data
+            # Not kept while the next mesh is decoded, the consumer holds the only reference
+            del mesh_data
+
+def stream_scx_data(scx_path: str, kinds = None):
+    """
+    Same as read_scx_data, but "meshes" is a generator decoding one mesh at a time.
+    The file stays open until the generator is exhausted or closed.
+    """
+    scx = BinaryReader(scx_path, mapped = True)
+    version = open_scx(scx)
+    if not version:
+        scx.close()
+        return
+
+    return {"meshes": iter_scx_meshes(scx, version, kinds), "version": version}
+
+def read_scx_file(scx_path: str, kinds = None):
+    return read_scx_data(scx_path, kinds), read_tex_list(scx_path)
@@ -0,0 +1,179 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import bpy
+from . import scx_cache
+
+"""
+Texture lookup and preloading.
+Texture directories are indexed once (file name to path), the index is kept next to the parse cache.
+Files are read in a thread pool, images are created and packed on the main thread once per session.
+"""
+
+LOAD_TEXTURES = True # Search .tex entries on disk and load them
+PACK_TEXTURES = True # Pack loaded images into the .blend file
+TEXTURE_DIR = "" # Game directory, searched when a texture isn't found next to the SCX file
+
+IMAGE_EXTENSIONS = {".png", ".tga", ".dds", ".bmp", ".jpg", ".jpeg", ".tif", ".tiff"}
+INDEX_VERSION = 1
+
+INDEXES = {} # Directory to {name: path}, per import
+RESOLVED = {} # (SCX directory, .tex entry) to file path or None, per import
+IMAGES = {} # File path to image name
+CURRENT = {} # .tex entry to image name, for the file being built
+CURRENT_PATHS = {} # .tex entry to file path, for the file being built
+
+def index_path(root: str):
+    key = hashlib.sha1(root.encode("utf-8")).hexdigest()
+    return os.path.join(scx_cache.CACHE_DIR, f"textures_{key}.json")
+
+def scan_directory(root: str):
+    dirs = {}
+    files = {}
+
+    for directory, dir_names, file_names in os.walk(root):
+        dirs[directory] = os.stat(directory).st_mtime_ns
+        for file_name in file_names:
+            stem, extension = os.path.splitext(file_name.lower())
+            if extension in IMAGE_EXTENSIONS:
+                path = os.path.join(directory, file_name)
+                files.setdefault(file_name.lower(), path)
+                # Entries sometimes name another format than the file on disk
+                files.setdefault(stem, path)
+
+    return {"version": INDEX_VERSION, "dirs": dirs, "files": files}
+
+def is_index_valid(index: dict):
+    if index.get("version") != INDEX_VERSION:
+        return False
+
+    # Directory mtime changes when files are added, removed or renamed in it
+    try:
+        return all(os.stat(directory).st_mtime_ns == mtime for directory, mtime in index["dirs"].items())
+    except OSError:
+        return False
+
+def get_texture_index(root: str):
+    root = os.path.abspath(root)
+    if root in INDEXES:
+        return INDEXES[root]
+
+    path = index_path(root)
+    index = None
+
+    try:
+        with open(path, "rt", encoding = "utf-8") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        pass
+
+    if not index or not is_index_valid(index):
+        index = scan_directory(root)
+        try:
+            os.makedirs(scx_cache.CACHE_DIR, exist_ok = True)
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, "wt", encoding = "utf-8") as f:
+                json.dump(index, f)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"Texture index write failed: {e}")
+
+    INDEXES[root] = index["files"]
+    return index["files"]
+
+def resolve_texture_path(texture_path: str, scx_dir: str):
+    key = (scx_dir, texture_path)
+    if key in RESOLVED:
+        return RESOLVED[key]
+
+    relative_path = texture_path.replace("\\", "/")
+    candidates = [os.path.join(scx_dir, relative_path)]
+    if TEXTURE_DIR:
+        candidates.append(os.path.join(TEXTURE_DIR, relative_path))
+
+    path = next((x for x in candidates if os.path.isfile(x)), None)
+
+    if path is None and TEXTURE_DIR:
+        files = get_texture_index(TEXTURE_DIR)
+        name = os.path.basename(relative_path).lower()
+        path = files.get(name) or files.get(os.path.splitext(name)[0])
+
+    RESOLVED[key] = path
+    return path
+
+def read_file(path: str):
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+def create_image(path: str, data: bytes):
+    if not data:
+        return bpy.data.images.load(path, check_existing = True)
+
+    image = bpy.data.images.new(Path(path).stem, 1, 1)
+    image.filepath_raw = path
+    image.pack(data = data, data_len = len(data))
+    image.source = "FILE"
+    return image
+
+def preload_textures(tex_list: list, scx_path: str):
+    CURRENT.clear()
+    CURRENT_PATHS.clear()
+    if not LOAD_TEXTURES:
+        return
+
+    scx_dir = os.path.dirname(os.path.abspath(scx_path))
+    paths = {}
+    for texture_path in dict.fromkeys(tex_list):
+        if texture_path:
+            path = resolve_texture_path(texture_path, scx_dir)
+            if path:
+                paths[texture_path] = path
+
+    CURRENT_PATHS.update((texture_path, os.path.abspath(path)) for texture_path, path in paths.items())
+
+    # Files not loaded in this session yet, or whose image was removed since
+    new_paths = list(dict.fromkeys(x for x in paths.values() if bpy.data.images.get(IMAGES.get(x, "")) is None))
+
+    if new_paths:
+        if PACK_TEXTURES:
+            with ThreadPoolExecutor() as pool:
+                datas = list(pool.map(read_file, new_paths))
+        else:
+            datas = [None] * len(new_paths)
+
+        for path, data in zip(new_paths, datas):
+            try:
+                IMAGES[path] = create_image(path, data).name
+            except RuntimeError as e:
+                print(f"Texture load failed: {e}")
+
+    for texture_path, path in paths.items():
+        if path in IMAGES:
+            CURRENT[texture_path] = IMAGES[path]
+
+def resolved_tex_list(tex_list: list):
+    # Same entries next to different SCX files can be different files, entries not found on disk are kept as they are
+    return [CURRENT_PATHS.get(texture_path, texture_path) for texture_path in tex_list]
+
+def get_texture_image(texture_path: str):
+    name = CURRENT.get(texture_path)
+    if name:
+        return bpy.data.images.get(name)
+    return None
+
+def setup_flags(load_textures = True, pack_textures = True, texture_dir = ""):
+    # Lookups are redone every import, files may have been added since. Unchanged indexes are only validated
+    INDEXES.clear()
+    RESOLVED.clear()
+    global LOAD_TEXTURES
+    LOAD_TEXTURES = load_textures
+    global PACK_TEXTURES
+    PACK_TEXTURES = pack_textures
+    global TEXTURE_DIR
+    TEXTURE_DIR = texture_dir
@@ -1,134 +1,31 @@
 from pathlib import Path
 
-import bmesh
 import bpy
-from .BinaryReader import BinaryReader
+from .scx_common import prepare_triangles, weld_vertices, preview_mesh
+from .scx_materials import material_hash, get_shared_material, store_shared_material, material_to_json
+from .scx_mesh import fill_mesh, add_attributes, build_joined_mesh
+from .scx_nodes import build_material_nodes
+from .scx_profile import stage
+from .scx_textures import get_texture_image, resolved_tex_list
 
 SKIP_DOUBLESIDE_FACES = True # I'm not sure we shouldn't skip such faces
 RE_USE_MATERIALS = False # Don't use this. It's wrong. But if you know what you're doing, then please...
 JOIN_MESHES = False # It can have destructive effects. But who gives a fuck?
-
-class MaterialFlags():
-    def __init__(self, int):
-        self.int = int
-
-        self.__material_flags__ = [
-            ["AlphaOpacity", 0x1],
-            ["VecrtexColorBlend", 0x2],
-            ["Layer2BlendByAlpha", 0x40],
-            ["DiffuseBlend", 0x100],
-            ["Layer2VertexColorBlend", 0x1000]
-        ]
-
-        for flag in self.__material_flags__:
-            self.__setattr__(flag[0], (int & flag[1] & 0xFFFFFFFF) != 0)
-
-    def __int__(self):
-        return self.int
-
-    def __str__(self):
-        return f"< {' | '.join([x[0] for x in self.__material_flags__ if self.__getattribute__(x[0]) == True])} >"
-
-def read_material_data(scx: BinaryReader):
-    size = scx.ReadUInt32()
-
-    if size == 0:
-        return False
-
-    material = {}
-
-    material["size"] = size
-    material["DiffuseColor"] = [ scx.ReadSingle(), scx.ReadSingle(), scx.ReadSingle(), scx.ReadSingle() ]
-    material["SpecularColor"] = [ scx.ReadSingle(), scx.ReadSingle(), scx.ReadSingle() ]
-    material["SpecularIntensity"] = scx.ReadSingle()
-    material["GlossinesWeight"] = scx.ReadSingle()
-
-    material["Flags"] = MaterialFlags(scx.ReadUInt32())
-
-    material["DiffuseMapIndex"] = scx.ReadUInt16()
-    material["BumpMapIndex"] = scx.ReadUInt16()
-    material["SpecularMapIndex"] = scx.ReadUInt16()
-    material["ReflectionMapIndex"] = scx.ReadUInt16()
-    material["DiffuseLayer2MapIndex"] = scx.ReadUInt16()
-    scx.seek(2)
-
-    if size > 56:
-        material["IlluninationMapIndex"] = scx.ReadUInt16()
-        scx.seek(2)
-        material["VertexSize"] = scx.ReadUInt32()
-        scx.seek(4 + 2)
-        material["DiffuseMix1MapChannel"] = scx.ReadUInt16()
-        material["DiffuseMix2MapChannel"] = scx.ReadUInt16()
-        material["BumpMapChannel"] = scx.ReadUInt16()
-        material["SpecularMapChannel"] = scx.ReadUInt16()
-        scx.seek(2 + 4 + 4 + 4)
-        material["IlluminationColor"] = [ scx.ReadSingle(), scx.ReadSingle(), scx.ReadSingle() ]
-
-    if size > 104:
-        material["name"] = scx.ReadNullTerminatedSizedString(32)
-
-    return material
-
-def read_vertex_data(scx: BinaryReader, material_size):
-    vertex_count = scx.ReadUInt32()
-
-    data = {
-        "count": vertex_count,
-        "Position": [],
-        "Normal": [],
-        "UV1": [],
-        "UV2": [],
-        "Color": [],
-        "UV3": []
-    }
-
-    for i in range(vertex_count):
-        x, y, z = scx.ReadSingle() / 100, scx.ReadSingle() / 100, scx.ReadSingle() / 100
-        data["Position"].append([ x, -z, y ])
-        x, y, z = scx.ReadSingle(), scx.ReadSingle(), scx.ReadSingle()
-        data["Normal"].append([ x, -z, y ])
-        data["UV1"].append([ scx.ReadSingle(), 1 - scx.ReadSingle() ])
-        data["UV2"].append([ scx.ReadSingle(), 1 - scx.ReadSingle() ])
-        data["Color"].append([ scx.ReadByte() / 255, scx.ReadByte() / 255, scx.ReadByte() / 255, scx.ReadByte() / 255 ])
-
-        if material_size > 56:
-            scx.seek(4 + 4)
-            data["UV3"].append([ scx.ReadSingle(), 1 - scx.ReadSingle() ])
-            scx.seek(4)
-
-    return data
-
-def read_indices_data(scx: BinaryReader):
-    face_count = scx.ReadUInt32()
-
-    triangles = []
-
-    for i in range(face_count):
-        triangles.append([ scx.ReadUInt32(), scx.ReadUInt32(), scx.ReadUInt32() ])
-
-    return triangles
-
-def read_scx_data(scx: BinaryReader):
-    pos = scx.tell()
-    scx.seek(0, 2)
-    EOF = scx.tell()
-    scx.seek(pos, 0)
-
-    meshes_data = []
-
-    while not (scx.tell() == EOF or 4 >= (EOF - scx.tell())):
-        mesh_data = {}
-
-        mesh_data["material"] = read_material_data(scx)
-        if mesh_data["material"] == False:
-            break
-        else:
-            mesh_data["vertex"] = read_vertex_data(scx, mesh_data["material"]["size"])
-            mesh_data["face"] = read_indices_data(scx)
-
-            meshes_data.append(mesh_data)
-
-    return {"meshes": meshes_data, "version": 3}
+SHARE_MATERIALS = True # Identical materials across meshes and files use one Blender material
+WELD_VERTICES = False # Merge vertices split at UV and normal seams
+WELD_DISTANCE = 0.0001
+PREVIEW_MODE = "NONE" # "BOUNDS" or "DECIMATE" builds positions and faces only, without attributes and materials
+PREVIEW_RATIO = 0.1 # Share of vertices kept by "DECIMATE"
+
+# Node group map keys to material data entries, diffuse first so exporters find it first.
+# Map channels of the 104+ byte header aren't used, their numbering isn't known
+MATERIAL_MAPS = {
+    "Diffuse": "DiffuseMapIndex",
+    "MixSecond": "DiffuseLayer2MapIndex",
+    "Bump": "BumpMapIndex",
+    "Reflection": "ReflectionMapIndex",
+    "Emissive": "IlluninationMapIndex"
+}
 
 def get_material_texture(index: int, tex_list: list, material_name: str):
     texture_name = f"{material_name}_0x{index:08X}".lower()
@@ -138,6 +35,11 @@ def get_material_texture(index: int, tex_list: list, material_name: str):
         texture_path = tex_list[index]
         texture_name = Path(texture_path).stem
 
+        # Preloaded from disk
+        image = get_texture_image(texture_path)
+        if image:
+            return image
+
     image = bpy.data.images.get(texture_name)
 
     if not image:
@@ -153,9 +55,14 @@ def get_material(material_data: list, tex_list: list):
         if material_node:
             return material_node
 
+    if SHARE_MATERIALS:
+        digest = material_hash(material_data, resolved_tex_list(tex_list))
+        material_node = get_shared_material(digest, bpy.data.materials)
+        if material_node:
+            return material_node
+
     material_node = bpy.data.materials.new(name = material_data["name"])
     material_node.preview_render_type = "FLAT"
-    material_node.use_nodes = True
     material_node.diffuse_color = material_data["DiffuseColor"]
     if material_data.get("SpecularColor"):
         material_node.specular_color = material_data["SpecularColor"][0:3]
@@ -166,42 +73,47 @@ def get_material(material_data: list, tex_list: list):
     material_node.blend_method = 'BLEND'
     material_node.show_transparent_back = False
 
-    material_nodes = material_node.node_tree.nodes
-
-    material_bsdf = material_nodes["Principled BSDF"]
-    material_bsdf.show_options = False
-    material_bsdf.inputs[0].default_value = material_data["DiffuseColor"] # BaseColor
-    material_bsdf.inputs[6].default_value = 0 # Metallic
-    if material_data.get("SpecularIntensity"):
-        material_bsdf.inputs[7].default_value = material_data["SpecularIntensity"] # Specular
-    material_bsdf.inputs[9].default_value = 0 # Roughness
-
-    image_node = material_nodes.new(type = "ShaderNodeTexImage")
-    image_node.location = (-280, 300)
-    image_node.interpolation = "Cubic"
-    if material_data.get("DiffuseMapIndex"):
-        if material_data["DiffuseMapIndex"] != 0xFFFF:
-            image_node.image = get_material_texture(material_data["DiffuseMapIndex"], tex_list, material_data["name"])
-            image_node.image.alpha_mode = "STRAIGHT"
+    maps = {}
+    for key, name in MATERIAL_MAPS.items():
+        index = material_data.get(name, 0xFFFF)
+        if index != 0xFFFF:
+            maps[key] = {"image": get_material_texture(index, tex_list, material_data["name"])}
+
+    if "Diffuse" in maps:
+        maps["Diffuse"]["image"].alpha_mode = "STRAIGHT"
+
+    emissive_color = [*material_data["IlluminationColor"], 1] if material_data.get("IlluminationColor") else [1, 1, 1, 1]
+    values = {
+        "Diffuse Color": material_data["DiffuseColor"],
+        "Opacity": material_data["DiffuseColor"][3],
+        "Specular Intensity": material_data.get("SpecularIntensity", 0),
+        "Bump Strength": 1 if "Bump" in maps else 0,
+        "Reflection Intensity": 1 if "Reflection" in maps else 0,
+        "Emissive Color": emissive_color if "Emissive" in maps else [0, 0, 0, 1]
+    }
 
-    material_links = material_node.node_tree.links
+    build_material_nodes(material_node, values, maps)
 
-    material_links.new(
-        image_node.outputs["Color"],
-        material_bsdf.inputs["Base Color"]
-    )
+    # Original material data for the exporter
+    material_node["scx_material"] = material_to_json(material_data, tex_list)
+    material_node["scx_version"] = 3
 
-    material_links.new(
-        image_node.outputs["Alpha"],
-        material_bsdf.inputs["Alpha"]
-    )
+    if SHARE_MATERIALS:
+        store_shared_material(digest, material_node)
 
     return material_node
 
 def build_mesh(scx_data: list, scx_name: str, tex_list: list):
-    bpy.ops.object.empty_add(type="ARROWS")
-    scx_empty = bpy.context.view_layer.objects.active
-    scx_empty.name = scx_name
+    # scx_data can be a generator, meshes are only kept until they are built
+    # Yields the vertex count of every mesh once it's built and returns the top level objects, see scx_import.build_scx
+    if not JOIN_MESHES:
+        bpy.ops.object.empty_add(type="ARROWS")
+        scx_empty = bpy.context.view_layer.objects.active
+        scx_empty.name = scx_name
+
+    # Join mode builds one mesh from all of them at the end
+    join_parts = []
+    join_materials = []
 
     for mesh_data in scx_data:
         material_data = mesh_data.get("material")
@@ -214,81 +126,92 @@ def build_mesh(scx_data: list, scx_name: str, tex_list: list):
         else:
             mesh_name = scx_name
 
-        bpy_mesh = bpy.data.meshes.new(mesh_name)
-        bpy_obj = bpy.data.objects.new(mesh_name, bpy_mesh)
-        bpy.context.scene.collection.objects.link(bpy_obj)
-        bpy_obj.parent = scx_empty
+        vertex_data = mesh_data["vertex"]
 
-        bm = bmesh.new()
-        bm.from_mesh(bpy_mesh)
+        positions, remap = vertex_data["Position"], None
+        attributes = {}
 
-        vertex_data = mesh_data["vertex"]
+        if PREVIEW_MODE != "NONE":
+            with stage("preview", scx_name, mesh_name, len(positions)):
+                positions, triangles = preview_mesh(positions, mesh_data["face"], PREVIEW_MODE, PREVIEW_RATIO)
+            corners = triangles
+        else:
+            if WELD_VERTICES:
+                with stage("weld", scx_name, mesh_name, len(positions)):
+                    positions, remap = weld_vertices(positions, WELD_DISTANCE)
+
+            with stage("triangles", scx_name, mesh_name, len(mesh_data["face"])):
+                triangles, corners = prepare_triangles(mesh_data["face"], SKIP_DOUBLESIDE_FACES, remap)
+
+            attributes = {
+                "UV1": vertex_data["UV1"],
+                "UV2": vertex_data["UV2"],
+                "Color": vertex_data["Color"]
+            }
+            if material_data["size"] > 56:
+                attributes["UV3"] = vertex_data["UV3"]
+
+        material = None
+        if material_data and PREVIEW_MODE == "NONE":
+            with stage("material", scx_name, mesh_name):
+                material = get_material(material_data, tex_list)
+
+        if JOIN_MESHES:
+            if material is not None and material not in join_materials:
+                join_materials.append(material)
+
+            join_parts.append({
+                "positions": positions,
+                "triangles": triangles,
+                "corners": corners,
+                "attributes": attributes,
+                "material_index": join_materials.index(material) if material is not None else 0
+            })
+        else:
+            bpy_mesh = bpy.data.meshes.new(mesh_name)
+            bpy_obj = bpy.data.objects.new(mesh_name, bpy_mesh)
+            bpy.context.scene.collection.objects.link(bpy_obj)
+            bpy_obj.parent = scx_empty
 
-        uv_layer1 = bm.loops.layers.uv.new("UV1")
-        uv_layer2 = bm.loops.layers.uv.new("UV2")
-        vertex_color = bm.loops.layers.color.new("Color")
-        if material_data["size"] > 56:
-            uv_layer3 = bm.loops.layers.uv.new("UV3")
-
-        verts = []
-
-        for i in range(vertex_data["count"]):
-            vertex = bm.verts.new(vertex_data["Position"][i])
-            vertex.normal = vertex_data["Normal"][i]
-            vertex.index = i
-
-            verts.append(vertex)
-
-        for indices in mesh_data["face"]:
-            try:
-                face = bm.faces.new([verts[indices[0]], verts[indices[1]], verts[indices[2]]])
-                face.smooth = True
-            except:
-                if SKIP_DOUBLESIDE_FACES:
-                    pass
-                else:
-                    face = bm.faces.get([verts[indices[0]], verts[indices[1]], verts[indices[2]]])
-                    if face:
-                        face = face.copy(verts=False, edges=True)
-                        face.normal_flip()
-                        face.smooth = True
-
-        for face in bm.faces:
-            for loop in face.loops:
-                loop[vertex_color] = vertex_data["Color"][loop.vert.index]
-                loop[uv_layer1].uv = vertex_data["UV1"][loop.vert.index]
-                loop[uv_layer2].uv = vertex_data["UV2"][loop.vert.index]
-                if material_data["size"] > 56:
-                    loop[uv_layer3].uv = vertex_data["UV3"][loop.vert.index]
-
-        bm.to_mesh(bpy_mesh)
-        bm.free()
-
-        mesh_data["object"] = bpy_obj
+            with stage("mesh", scx_name, mesh_name, len(positions)):
+                fill_mesh(bpy_mesh, positions, triangles)
+            with stage("attributes", scx_name, mesh_name, corners.size):
+                add_attributes(bpy_mesh, attributes, corners)
 
-        if material_data:
-            bpy_mesh.materials.append(get_material(material_data, tex_list))
+            if material is not None:
+                bpy_mesh.materials.append(material)
 
-    if JOIN_MESHES:
-        bpy_main_obj = scx_data[0]["object"]
+        vertex_count = len(positions)
+
+        # Decoded arrays are freed before the next mesh is read when streaming, unless they are joined
+        del mesh_data, vertex_data, positions, remap, triangles, corners, attributes
 
-        for i in range(1, len(scx_data)):
-            bpy.ops.object.select_all(action = "DESELECT")
-            scx_data[i]["object"].select_set(True)
-            bpy_main_obj.select_set(True)
-            bpy.context.view_layer.objects.active = bpy_main_obj
-            bpy.ops.object.join()
+        yield vertex_count
+
+    if JOIN_MESHES:
+        with stage("join", scx_name, count = len(join_parts)):
+            bpy_obj = build_joined_mesh(scx_name, join_parts, join_materials)
 
-        with bpy.context.temp_override(selected_objects=[scx_empty]):
-            bpy.ops.object.delete()
+        bpy.context.view_layer.objects.active = bpy_obj
+        bpy_obj.select_set(True)
+        return [bpy_obj]
 
-        bpy_main_obj.name = scx_name
-        bpy_main_obj.data.name = scx_name
+    return [scx_empty]
 
-def setup_flags(join_meshes = False, re_use_materials = False, skip_doubleside_faces = True):
+def setup_flags(join_meshes = False, re_use_materials = False, skip_doubleside_faces = True, share_materials = True, weld_vertices = False, weld_distance = 0.0001, preview_mode = "NONE", preview_ratio = 0.1):
     global JOIN_MESHES
     JOIN_MESHES = join_meshes
     global RE_USE_MATERIALS
     RE_USE_MATERIALS = re_use_materials
     global SKIP_DOUBLESIDE_FACES
     SKIP_DOUBLESIDE_FACES = skip_doubleside_faces
+    global SHARE_MATERIALS
+    SHARE_MATERIALS = share_materials
+    global WELD_VERTICES
+    WELD_VERTICES = weld_vertices
+    global WELD_DISTANCE
+    WELD_DISTANCE = weld_distance
+    global PREVIEW_MODE
+    PREVIEW_MODE = preview_mode
+    global PREVIEW_RATIO
+    PREVIEW_RATIO = preview_ratio
@@ -0,0 +1,180 @@
+import numpy as np
+
+from .BinaryReader import BinaryReader
+from .scx_cache import register_flag_type
+from .scx_common import (
+    to_blender_axis,
+    flip_uv,
+    unpack_color,
+    empty_attribute,
+    validate_indices
+)
+
+@register_flag_type
+class MaterialFlags():
+    def __init__(self, int):
+        self.int = int
+
+        self.__material_flags__ = [
+            ["AlphaOpacity", 0x1],
+            ["VecrtexColorBlend", 0x2],
+            ["Layer2BlendByAlpha", 0x40],
+            ["DiffuseBlend", 0x100],
+            ["Layer2VertexColorBlend", 0x1000]
+        ]
+
+        for flag in self.__material_flags__:
+            self.__setattr__(flag[0], (int & flag[1] & 0xFFFFFFFF) != 0)
+
+    def __int__(self):
+        return self.int
+
+    def __str__(self):
+        return f"< {' | '.join([x[0] for x in self.__material_flags__ if self.__getattribute__(x[0]) == True])} >"
+
+# Vertex layouts, 44 bytes for short materials and 64 bytes when material size > 56
+VERTEX_DTYPE = np.dtype([
+    ("Position", "<f4", 3),
+    ("Normal", "<f4", 3),
+    ("UV1", "<f4", 2),
+    ("UV2", "<f4", 2),
+    ("Color", "u1", 4)
+])
+
+VERTEX_DTYPE_EXTENDED = np.dtype([
+    ("Position", "<f4", 3),
+    ("Normal", "<f4", 3),
+    ("UV1", "<f4", 2),
+    ("UV2", "<f4", 2),
+    ("Color", "u1", 4),
+    ("Unknown", "<u4", 2),
+    ("UV3", "<f4", 2),
+    ("Unknown2", "<u4")
+])
+
+def read_material_data(scx: BinaryReader):
+    size = scx.ReadUInt32()
+
+    if size == 0:
+        return False
+
+    material = {}
+
+    material["size"] = size
+    material["DiffuseColor"] = [ scx.ReadSingle(), scx.ReadSingle(), scx.ReadSingle(), scx.ReadSingle() ]
+    material["SpecularColor"] = [ scx.ReadSingle(), scx.ReadSingle(), scx.ReadSingle() ]
+    material["SpecularIntensity"] = scx.ReadSingle()
+    material["GlossinesWeight"] = scx.ReadSingle()
+
+    material["Flags"] = MaterialFlags(scx.ReadUInt32())
+
+    material["DiffuseMapIndex"] = scx.ReadUInt16()
+    material["BumpMapIndex"] = scx.ReadUInt16()
+    material["SpecularMapIndex"] = scx.ReadUInt16()
+    material["ReflectionMapIndex"] = scx.ReadUInt16()
+    material["DiffuseLayer2MapIndex"] = scx.ReadUInt16()
+    scx.seek(2)
+
+    if size > 56:
+        material["IlluninationMapIndex"] = scx.ReadUInt16()
+        scx.seek(2)
+        material["VertexSize"] = scx.ReadUInt32()
+        scx.seek(4 + 2)
+        material["DiffuseMix1MapChannel"] = scx.ReadUInt16()
+        material["DiffuseMix2MapChannel"] = scx.ReadUInt16()
+        material["BumpMapChannel"] = scx.ReadUInt16()
+        material["SpecularMapChannel"] = scx.ReadUInt16()
+        scx.seek(2 + 4 + 4 + 4)
+        material["IlluminationColor"] = [ scx.ReadSingle(), scx.ReadSingle(), scx.ReadSingle() ]
+
+    if size > 104:
+        material["name"] = scx.ReadNullTerminatedSizedString(32)
+
+    return material
+
+def vertex_dtype(material_size):
+    if material_size > 56:
+        return VERTEX_DTYPE_EXTENDED
+
+    return VERTEX_DTYPE
+
+def read_vertex_data(scx: BinaryReader, material_size):
+    vertex_count = scx.ReadUInt32()
+
+    dtype = vertex_dtype(material_size)
+    raw = scx.ReadArray(vertex_count, dtype)
+
+    data = {
+        "count": vertex_count,
+        "Position": to_blender_axis(raw["Position"], 1 / 100),
+        "Normal": to_blender_axis(raw["Normal"]),
+        "UV1": flip_uv(raw["UV1"]),
+        "UV2": flip_uv(raw["UV2"]),
+        "Color": unpack_color(raw["Color"]),
+        "UV3": empty_attribute(2)
+    }
+
+    if material_size > 56:
+        data["UV3"] = flip_uv(raw["UV3"])
+
+    return data
+
+def read_indices_data(scx: BinaryReader):
+    face_count = scx.ReadUInt32()
+
+    return scx.ReadArray(face_count * 3, "<u4").reshape(face_count, 3)
+
+def skip_vertex_data(scx: BinaryReader, material_size):
+    vertex_count = scx.ReadUInt32()
+    scx.seek(vertex_count * vertex_dtype(material_size).itemsize)
+    return vertex_count
+
+def skip_indices_data(scx: BinaryReader):
+    face_count = scx.ReadUInt32()
+    scx.seek(face_count * 3 * 4)
+    return face_count
+
+def read_mesh_list(scx: BinaryReader):
+    pos = scx.tell()
+    scx.seek(0, 2)
+    EOF = scx.tell()
+    scx.seek(pos, 0)
+
+    meshes = []
+
+    while not (scx.tell() == EOF or 4 >= (EOF - scx.tell())):
+        material_data = read_material_data(scx)
+        if material_data == False:
+            break
+
+        meshes.append({
+            "kind": "render",
+            "material": material_data,
+            "vertex_count": skip_vertex_data(scx, material_data["size"]),
+            "face_count": skip_indices_data(scx)
+        })
+
+    return meshes
+
+def iter_scx_meshes(scx: BinaryReader):
+    pos = scx.tell()
+    scx.seek(0, 2)
+    EOF = scx.tell()
+    scx.seek(pos, 0)
+
+    while not (scx.tell() == EOF or 4 >= (EOF - scx.tell())):
+        mesh_data = {"kind": "render"}
+
+        mesh_data["material"] = read_material_data(scx)
+        if mesh_data["material"] == False:
+            break
+        else:
+            mesh_data["vertex"] = read_vertex_data(scx, mesh_data["material"]["size"])
+            mesh_data["face"] = read_indices_data(scx)
+            validate_indices(mesh_data["face"], mesh_data["vertex"]["count"])
+
+            yield mesh_data
+            del mesh_data
+
+def read_scx_data(scx: BinaryReader):
+    return {"meshes": list(iter_scx_meshes(scx)), "version": 3}
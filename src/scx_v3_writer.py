@@ -0,0 +1,83 @@
+import numpy as np
+
+from .BinaryWriter import BinaryWriter
+from .scx_common import from_blender_axis, flip_uv, pack_color
+from .scx_v3_reader import VERTEX_DTYPE, VERTEX_DTYPE_EXTENDED
+
+MATERIAL_SIZE = 136 # Extended material with name, vertices use VERTEX_DTYPE_EXTENDED
+SHORT_MATERIAL_SIZE = 56 # Without map channels, illumination and name, vertices use VERTEX_DTYPE
+
+def material_size(material_data: dict):
+    # Short materials read from a file are written short again, anything else extended
+    if material_data.get("size") == SHORT_MATERIAL_SIZE:
+        return SHORT_MATERIAL_SIZE
+    return MATERIAL_SIZE
+
+def write_material_data(scx: BinaryWriter, material_data: dict):
+    size = material_size(material_data)
+    scx.WriteUInt32(size)
+    scx.WriteArray(material_data.get("DiffuseColor", [1, 1, 1, 1]), "<f4")
+    scx.WriteArray(material_data.get("SpecularColor", [0, 0, 0]), "<f4")
+    scx.WriteSingle(material_data.get("SpecularIntensity", 0))
+    scx.WriteSingle(material_data.get("GlossinesWeight", 0))
+
+    scx.WriteUInt32(int(material_data.get("Flags", 0)))
+
+    scx.WriteUInt16(material_data.get("DiffuseMapIndex", 0xFFFF))
+    scx.WriteUInt16(material_data.get("BumpMapIndex", 0xFFFF))
+    scx.WriteUInt16(material_data.get("SpecularMapIndex", 0xFFFF))
+    scx.WriteUInt16(material_data.get("ReflectionMapIndex", 0xFFFF))
+    scx.WriteUInt16(material_data.get("DiffuseLayer2MapIndex", 0xFFFF))
+    scx.WriteUInt16(0xFFFF)
+
+    if size == SHORT_MATERIAL_SIZE:
+        return
+
+    scx.WriteUInt16(material_data.get("IlluninationMapIndex", 0xFFFF))
+    scx.WriteUInt16(0xFFFF)
+    scx.WriteUInt32(VERTEX_DTYPE_EXTENDED.itemsize)
+    scx.WriteUInt32(0)
+    scx.WriteUInt16(0)
+    scx.WriteUInt16(material_data.get("DiffuseMix1MapChannel", 0))
+    scx.WriteUInt16(material_data.get("DiffuseMix2MapChannel", 0))
+    scx.WriteUInt16(material_data.get("BumpMapChannel", 0))
+    scx.WriteUInt16(material_data.get("SpecularMapChannel", 0))
+    scx.WriteUInt16(0)
+    scx.WriteArray([0, 0, 0], "<u4")
+    scx.WriteArray(material_data.get("IlluminationColor", [0, 0, 0]), "<f4")
+
+    scx.WriteNullTerminatedSizedString(material_data.get("name") or "", 32)
+
+def write_vertex_data(scx: BinaryWriter, vertex_data: dict, dtype: np.dtype = VERTEX_DTYPE_EXTENDED):
+    vertex_count = len(vertex_data["Position"])
+
+    raw = np.zeros(vertex_count, dtype = dtype)
+    raw["Position"] = from_blender_axis(vertex_data["Position"], 100)
+    if len(vertex_data.get("Normal", [])) > 0:
+        raw["Normal"] = from_blender_axis(vertex_data["Normal"])
+    for key in ("UV1", "UV2", "UV3"):
+        if key in dtype.names and len(vertex_data.get(key, [])) > 0:
+            raw[key] = flip_uv(vertex_data[key])
+    if len(vertex_data.get("Color", [])) > 0:
+        raw["Color"] = pack_color(vertex_data["Color"])
+    else:
+        raw["Color"] = 255
+
+    scx.WriteUInt32(vertex_count)
+    scx.WriteArray(raw)
+
+def write_indices_data(scx: BinaryWriter, triangles: np.ndarray):
+    triangles = np.asarray(triangles).reshape(-1, 3)
+
+    scx.WriteUInt32(len(triangles))
+    scx.WriteArray(triangles, "<u4")
+
+def write_scx_data(scx: BinaryWriter, scx_data: dict):
+    for mesh_data in scx_data["meshes"]:
+        if "vertex" not in mesh_data or "face" not in mesh_data:
+            continue
+
+        material_data = mesh_data.get("material") or {}
+        write_material_data(scx, material_data)
+        write_vertex_data(scx, mesh_data["vertex"], VERTEX_DTYPE if material_size(material_data) == SHORT_MATERIAL_SIZE else VERTEX_DTYPE_EXTENDED)
+        write_indices_data(scx, mesh_data["face"])
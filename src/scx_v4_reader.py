@@ -0,0 +1,314 @@
+import numpy as np
+
+from .BinaryReader import BinaryReader
+from .scx_cache import register_flag_type
+from .scx_common import (
+    to_blender_axis,
+    flip_uv,
+    unpack_color,
+    empty_attribute,
+    validate_indices
+)
+
+@register_flag_type
+class VertexTypeFlags():
+    def __init__(self, int):
+        self.int = int
+
+        self.__vertex_type_flags__ = [
+            ["Position", 0x1],
+            ["BoneWeight0", 0x2],
+            ["BoneWeight1", 0x4],
+            ["BoneWeight2", 0x8],
+            ["BoneWeight3", 0x10],
+            ["BoneIndRef", 0x20],
+            ["Normal", 0x40],
+            ["VertexEmissive", 0x80],
+            ["VertexColor", 0x100],
+            ["UV1", 0x200],
+            ["UV2", 0x400],
+            ["UV3", 0x800],
+            ["BumpMapNormal", 0x40000]
+        ]
+
+        for flag in self.__vertex_type_flags__:
+            self.__setattr__(flag[0], (int & flag[1] & 0xFFFFFFFF) != 0)
+
+    def __int__(self):
+        return self.int
+
+    def __str__(self):
+        return f"< {' | '.join([x[0] for x in self.__vertex_type_flags__ if self.__getattribute__(x[0]) == True])} >"
+
+# Field layout of a single vertex, in file order
+VERTEX_FIELD_FORMATS = [
+    ["Position", ("<f4", 3)],
+    ["BoneWeight0", ("<f4",)],
+    ["BoneWeight1", ("<f4",)],
+    ["BoneWeight2", ("<f4",)],
+    ["BoneWeight3", ("<f4",)],
+    ["BoneIndRef", ("u1", 4)],
+    ["Normal", ("<f4", 3)],
+    ["VertexEmissive", ("u1", 4)],
+    ["VertexColor", ("u1", 4)],
+    ["UV1", ("<f4", 2)],
+    ["UV2", ("<f4", 2)],
+    ["UV3", ("<f4", 2)],
+    ["BumpMapNormal", ("<f4", 3)]
+]
+
+def read_material_map(scx: BinaryReader):
+    map = {}
+    map["index"] = scx.ReadUInt32()
+    map["channel"] = scx.ReadUInt32()
+    map["tillingFlag"] = scx.ReadUInt32()
+    map["tilling"] = [ scx.ReadSingle(), scx.ReadSingle() ]
+    map["offset"] = [ scx.ReadSingle(), scx.ReadSingle() ]
+    return map
+
+def read_material_data(scx: BinaryReader):
+    scx.seek(4 * 2)
+
+    flags = scx.ReadUInt32()
+    unknown = scx.ReadUInt32()
+    entries_count = scx.ReadUInt32()
+    entries = {"Flags": flags, "Unknown": unknown}
+
+    for i in range(entries_count):
+        entry_type = scx.ReadUInt32()
+
+        match entry_type:
+            case 0x00000000:
+                entries["DiffuseColor"] = [ scx.ReadByte() / 255, scx.ReadByte() / 255, scx.ReadByte() / 255, scx.ReadByte() / 255 ]
+            case 0x00000001:
+                entries["SpecularColor"] = [ scx.ReadByte() / 255, scx.ReadByte() / 255, scx.ReadByte() / 255, scx.ReadByte() / 255 ]
+            case 0x00000002:
+                entries["EmissiveColor"] = [ scx.ReadByte() / 255, scx.ReadByte() / 255, scx.ReadByte() / 255, scx.ReadByte() / 255 ]
+
+            case 0x01000000:
+                entries["SpecularIntensity"] = scx.ReadSingle() / 100
+            case 0x01000001:
+                entries["ReflectionIntensity"] = scx.ReadSingle() / 100
+            case 0x01000002:
+                entries["BumpIntensity"] = scx.ReadSingle() / 100
+
+            case 0x06000000:
+                entries["DiffuseMap"] = read_material_map(scx)
+            case 0x06000001:
+                entries["DiffuseMixSecond"] = read_material_map(scx)
+            case 0x06000002:
+                entries["BumpMap"] = read_material_map(scx)
+            case 0x06000003:
+                entries["ReflectionMap"] = read_material_map(scx)
+            case 0x06000004:
+                entries["EmissiveMap"] = read_material_map(scx)
+
+            case 0x08000000:
+                entries["name"] = scx.ReadNullTerminatedSizedString(32)
+
+    return entries
+
+def vertex_dtype(vertex_flags: VertexTypeFlags):
+    fields = []
+
+    for name, fmt in VERTEX_FIELD_FORMATS:
+        if vertex_flags.__getattribute__(name):
+            fields.append((name, *fmt))
+
+    return np.dtype(fields)
+
+def read_vertex_data(scx: BinaryReader):
+    scx.seek(4 * 2)
+
+    vetrex_count = scx.ReadUInt32()
+    vertex_type = scx.ReadUInt32()
+    vertex_flags = VertexTypeFlags(vertex_type)
+
+    dtype = vertex_dtype(vertex_flags)
+    raw = scx.ReadArray(vetrex_count, dtype)
+
+    data = {
+        "type": vertex_flags,
+        "count": vetrex_count,
+        "stride": dtype.itemsize,
+        "Position": empty_attribute(3),
+        "BoneWeight0": empty_attribute(1),
+        "BoneWeight1": empty_attribute(1),
+        "BoneWeight2": empty_attribute(1),
+        "BoneWeight3": empty_attribute(1),
+        "BoneIndRef": empty_attribute(4, np.uint8),
+        "Normal": empty_attribute(3),
+        "Emissive": empty_attribute(4),
+        "Color": empty_attribute(4),
+        "UV1": empty_attribute(2),
+        "UV2": empty_attribute(2),
+        "UV3": empty_attribute(2),
+        "BumpMapNormal": empty_attribute(3)
+    }
+
+    if vertex_flags.Position:
+        data["Position"] = to_blender_axis(raw["Position"], 1 / 100)
+    for name in ("BoneWeight0", "BoneWeight1", "BoneWeight2", "BoneWeight3"):
+        if vertex_flags.__getattribute__(name):
+            data[name] = raw[name].reshape(-1, 1).astype(np.float32)
+    if vertex_flags.BoneIndRef:
+        data["BoneIndRef"] = np.ascontiguousarray(raw["BoneIndRef"])
+    if vertex_flags.Normal:
+        data["Normal"] = to_blender_axis(raw["Normal"])
+    if vertex_flags.VertexEmissive:
+        data["Emissive"] = unpack_color(raw["VertexEmissive"])
+    if vertex_flags.VertexColor:
+        data["Color"] = unpack_color(raw["VertexColor"])
+    if vertex_flags.UV1:
+        data["UV1"] = flip_uv(raw["UV1"])
+    if vertex_flags.UV2:
+        data["UV2"] = flip_uv(raw["UV2"])
+    if vertex_flags.UV3:
+        data["UV3"] = flip_uv(raw["UV3"])
+
+    return data
+
+def read_indices_data(scx: BinaryReader):
+    scx.seek(4 * 2)
+
+    indices_count = scx.ReadUInt32()
+    triangle_count = int(indices_count / 3)
+
+    return scx.ReadArray(triangle_count * 3, "<u2").reshape(triangle_count, 3)
+
+def read_bone_list(scx: BinaryReader):
+    entry_type = scx.ReadUInt32()
+    size = scx.ReadUInt32()
+    count = scx.ReadUInt32()
+
+    # Layout isn't known beyond the count, width of a bone index is taken from the entry size
+    width = (size - 4 * 3) // count if count else 4
+    dtype = {1: "u1", 2: "<u2", 4: "<u4"}.get(width)
+    if dtype is None:
+        return {"sparse": entry_type == 2, "indices": np.empty(0, dtype = np.int32)}
+
+    return {"sparse": entry_type == 2, "indices": scx.ReadArray(count, dtype).astype(np.int32)}
+
+ENTRY_KEYS = {
+    0: "material",
+    2: "bones", # SparseBoneIndexList
+    3: "bones", # BoneIndexList
+    4: "vertex",
+    5: "face"
+}
+
+class ScxMesh(dict):
+    """
+    Mesh of a v4 file, entries are decoded on first access.
+    Either "render" (starts with MaterialDef) or "physics" (starts with HardSurfaceDef).
+    """
+    def __init__(self, scx_file, index: int, kind: str):
+        super().__init__()
+        self.scx_file = scx_file
+        self.index = index
+        self.kind = kind
+        self.offsets = {}
+
+    def __missing__(self, key):
+        if key not in self.offsets:
+            raise KeyError(key)
+        value = self.scx_file.read_entry(self, key)
+        self[key] = value
+        return value
+
+    def __contains__(self, key):
+        return key in self.offsets or super().__contains__(key)
+
+    def get(self, key, default = None):
+        if key in self:
+            return self[key]
+        return default
+
+    @property
+    def name(self):
+        material_data = self.get("material")
+        if material_data:
+            return material_data.get("name")
+
+    @property
+    def vertex_count(self):
+        if "vertex" not in self.offsets:
+            return 0
+        return self.scx_file.peek_count(self.offsets["vertex"])
+
+    @property
+    def face_count(self):
+        if "face" not in self.offsets:
+            return 0
+        return int(self.scx_file.peek_count(self.offsets["face"]) / 3)
+
+    def load(self):
+        # Decoded entries are handed over, not kept, so streamed meshes are freed once built
+        data = {"kind": self.kind}
+        for key in self.offsets:
+            value = self.pop(key, None)
+            data[key] = value if value is not None else self.scx_file.read_entry(self, key)
+        return data
+
+class ScxFile():
+    """
+    Header entry table of a v4 file, read once.
+    The reader must stay open while meshes are accessed.
+    """
+    def __init__(self, scx: BinaryReader):
+        self.scx = scx
+
+        header_entries_count = scx.ReadUInt32()
+        self.entries = scx.ReadArray(header_entries_count * 2, "<u4").reshape(-1, 2).tolist()
+        self.meshes = []
+
+        is_phys_mesh = False
+
+        for entry_type, entry_offset in self.entries:
+            if len(self.meshes) == 0 and entry_type == 1:
+                is_phys_mesh = True
+
+            if (entry_type == 1 and is_phys_mesh) or entry_type == 0:
+                self.meshes.append(ScxMesh(self, len(self.meshes), "render" if entry_type == 0 else "physics"))
+
+            key = ENTRY_KEYS.get(entry_type)
+            if key and len(self.meshes) > 0:
+                self.meshes[-1].offsets[key] = entry_offset
+
+    def peek_count(self, entry_offset: int):
+        self.scx.seek(entry_offset + 4 * 2, 0)
+        return self.scx.ReadUInt32()
+
+    def read_entry(self, mesh: ScxMesh, key: str):
+        self.scx.seek(mesh.offsets[key], 0)
+
+        if key == "material":
+            return read_material_data(self.scx)
+        elif key == "bones":
+            return read_bone_list(self.scx)
+        elif key == "vertex":
+            return read_vertex_data(self.scx)
+        elif key == "face":
+            triangles = read_indices_data(self.scx)
+            if "vertex" in mesh.offsets:
+                validate_indices(triangles, mesh.vertex_count)
+            return triangles
+
+def iter_scx_meshes(scx: BinaryReader, kinds = None):
+    for mesh in ScxFile(scx).meshes:
+        if not kinds or mesh.kind in kinds:
+            yield mesh.load()
+
+def read_scx_data(scx: BinaryReader, kinds = None):
+    scx_file = ScxFile(scx)
+    meshes_data = [mesh.load() for mesh in scx_file.meshes if not kinds or mesh.kind in kinds]
+    return {"meshes": meshes_data, "version": 4, "entries": scx_file.entries}
+
+def read_mesh_list(scx: BinaryReader):
+    scx_file = ScxFile(scx)
+    return [{
+        "kind": mesh.kind,
+        "material": mesh.get("material"),
+        "vertex_count": mesh.vertex_count,
+        "face_count": mesh.face_count
+    } for mesh in scx_file.meshes]
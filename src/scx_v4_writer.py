@@ -0,0 +1,172 @@
+import numpy as np
+
+from .BinaryWriter import BinaryWriter
+from .scx_common import from_blender_axis, flip_uv, pack_color
+from .scx_v4_reader import VertexTypeFlags, vertex_dtype
+
+# Material entries in the order they are written, see SCX4MaterialEntryType in imhex/scx.hexpat
+MATERIAL_COLORS = [
+    ["DiffuseColor", 0x00000000],
+    ["SpecularColor", 0x00000001],
+    ["EmissiveColor", 0x00000002]
+]
+
+MATERIAL_INTENSITIES = [
+    ["SpecularIntensity", 0x01000000],
+    ["ReflectionIntensity", 0x01000001],
+    ["BumpIntensity", 0x01000002]
+]
+
+MATERIAL_MAPS = [
+    ["DiffuseMap", 0x06000000],
+    ["DiffuseMixSecond", 0x06000001],
+    ["BumpMap", 0x06000002],
+    ["ReflectionMap", 0x06000003],
+    ["EmissiveMap", 0x06000004]
+]
+
+# Vertex data keys that differ from VertexTypeFlags field names
+VERTEX_DATA_KEYS = {
+    "VertexEmissive": "Emissive",
+    "VertexColor": "Color"
+}
+
+def begin_entry(scx: BinaryWriter, entry_type: int):
+    start = scx.tell()
+    scx.WriteUInt32(entry_type)
+    scx.WriteUInt32(0) # Size, patched by end_entry
+    return start
+
+def end_entry(scx: BinaryWriter, start: int):
+    end = scx.tell()
+    scx.seek(start + 4, 0)
+    scx.WriteUInt32(end - start)
+    scx.seek(end, 0)
+
+def write_material_map(scx: BinaryWriter, map: dict):
+    scx.WriteUInt32(map.get("index", 0))
+    scx.WriteUInt32(map.get("channel", 0))
+    scx.WriteUInt32(map.get("tillingFlag", 3))
+    scx.WriteArray(map.get("tilling", [1, 1]), "<f4")
+    scx.WriteArray(map.get("offset", [0, 0]), "<f4")
+
+def rgba(color, key: str):
+    # Colors are always 4 bytes, RGB gets an opaque alpha
+    color = list(color)
+    if len(color) == 3:
+        color.append(1.0)
+    if len(color) != 4:
+        raise ValueError(f"{key} needs 3 or 4 components, got {len(color)}")
+    return color
+
+def write_material_data(scx: BinaryWriter, material_data: dict):
+    start = begin_entry(scx, 0)
+    scx.WriteUInt32(material_data.get("Flags", 0))
+    scx.WriteUInt32(material_data.get("Unknown", 0))
+
+    colors = [x for x in MATERIAL_COLORS if material_data.get(x[0]) is not None]
+    intensities = [x for x in MATERIAL_INTENSITIES if material_data.get(x[0]) is not None]
+    maps = [x for x in MATERIAL_MAPS if material_data.get(x[0])]
+
+    scx.WriteUInt32(len(colors) + len(intensities) + len(maps) + 1)
+
+    for key, entry_type in colors:
+        scx.WriteUInt32(entry_type)
+        scx.WriteArray(pack_color(rgba(material_data[key], key)))
+    for key, entry_type in intensities:
+        scx.WriteUInt32(entry_type)
+        scx.WriteSingle(material_data[key] * 100)
+    for key, entry_type in maps:
+        scx.WriteUInt32(entry_type)
+        write_material_map(scx, material_data[key])
+
+    scx.WriteUInt32(0x08000000)
+    scx.WriteNullTerminatedSizedString(material_data.get("name") or "", 32)
+
+    end_entry(scx, start)
+
+def write_hard_surface_data(scx: BinaryWriter):
+    start = begin_entry(scx, 1)
+    scx.WriteUInt32(0)
+    end_entry(scx, start)
+
+def write_bone_list(scx: BinaryWriter, bones: dict):
+    start = begin_entry(scx, 2 if bones.get("sparse") else 3)
+    scx.WriteUInt32(len(bones["indices"]))
+    scx.WriteArray(bones["indices"], "<u4")
+    end_entry(scx, start)
+
+def vertex_flags_of(vertex_data: dict):
+    flags = 0
+    for name, value in VertexTypeFlags(0).__vertex_type_flags__:
+        if len(vertex_data.get(VERTEX_DATA_KEYS.get(name, name), [])) > 0:
+            flags |= value
+    return VertexTypeFlags(flags)
+
+def write_vertex_data(scx: BinaryWriter, vertex_data: dict):
+    vertex_count = len(vertex_data["Position"])
+    vertex_flags = vertex_flags_of(vertex_data)
+    dtype = vertex_dtype(vertex_flags)
+
+    raw = np.zeros(vertex_count, dtype = dtype)
+    for name in dtype.names:
+        value = np.asarray(vertex_data[VERTEX_DATA_KEYS.get(name, name)])
+        if name == "Position":
+            value = from_blender_axis(value, 100)
+        elif name in ("Normal", "BumpMapNormal"):
+            value = from_blender_axis(value)
+        elif name in ("VertexEmissive", "VertexColor"):
+            value = pack_color(value)
+        elif name in ("UV1", "UV2", "UV3"):
+            value = flip_uv(value)
+        raw[name] = value.reshape(raw[name].shape)
+
+    start = begin_entry(scx, 4)
+    scx.WriteUInt32(vertex_count)
+    scx.WriteUInt32(int(vertex_flags))
+    scx.WriteArray(raw)
+    end_entry(scx, start)
+
+def write_indices_data(scx: BinaryWriter, triangles: np.ndarray, vertex_count: int):
+    if vertex_count > 0x10000:
+        raise ValueError(f"SCX v4 mesh can't have more than 65536 vertices, got {vertex_count}")
+
+    triangles = np.asarray(triangles).reshape(-1, 3)
+
+    start = begin_entry(scx, 5)
+    scx.WriteUInt32(triangles.size)
+    scx.WriteArray(triangles, "<u2")
+    end_entry(scx, start)
+
+def write_scx_data(scx: BinaryWriter, scx_data: dict):
+    # Physics meshes are only recognized when the file starts with them
+    meshes_data = sorted(scx_data["meshes"], key = lambda mesh_data: mesh_data.get("kind") != "physics")
+
+    entries_count = sum(1 + sum(1 for key in ("bones", "vertex", "face") if key in mesh_data) for mesh_data in meshes_data)
+    scx.WriteUInt32(entries_count)
+    table_start = scx.tell()
+    scx.WriteBytes(bytes(entries_count * 4 * 2))
+
+    entries = []
+
+    for mesh_data in meshes_data:
+        entries.append([1 if mesh_data.get("kind") == "physics" else 0, scx.tell()])
+        if mesh_data.get("kind") == "physics":
+            write_hard_surface_data(scx)
+        else:
+            write_material_data(scx, mesh_data.get("material") or {"DiffuseColor": [1, 1, 1, 1]})
+
+        if "bones" in mesh_data:
+            entries.append([2 if mesh_data["bones"].get("sparse") else 3, scx.tell()])
+            write_bone_list(scx, mesh_data["bones"])
+        if "vertex" in mesh_data:
+            entries.append([4, scx.tell()])
+            write_vertex_data(scx, mesh_data["vertex"])
+        if "face" in mesh_data:
+            entries.append([5, scx.tell()])
+            write_indices_data(scx, mesh_data["face"], len(mesh_data.get("vertex", {}).get("Position", [])))
+
+    end = scx.tell()
+    scx.seek(table_start, 0)
+    scx.WriteArray(entries, "<u4")
+    scx.seek(end, 0)
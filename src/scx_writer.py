@@ -0,0 +1,31 @@
+import os
+
+from .BinaryWriter import BinaryWriter
+from .scx_v3_writer import write_scx_data as write_scx_data_v3
+from .scx_v4_writer import write_scx_data as write_scx_data_v4
+
+def write_tex_list(scx_path: str, tex_list: list):
+    tex_path = os.path.splitext(scx_path)[0] + ".tex"
+
+    with open(tex_path, "wt", encoding = "cp1251", errors = "replace", newline = "\r\n") as tex:
+        for tex_name in tex_list:
+            tex.write(f"{tex_name}\n")
+
+def write_scx_data(scx_path: str, scx_data: dict):
+    version = scx_data.get("version", 4)
+    if version not in (3, 4):
+        raise ValueError(f"SCX v{version} not supported")
+
+    with BinaryWriter(scx_path) as scx:
+        scx.WriteSizedString("INVO")
+        scx.WriteUInt32(version)
+
+        if version == 3:
+            write_scx_data_v3(scx, scx_data)
+        else:
+            write_scx_data_v4(scx, scx_data)
+
+def write_scx_file(scx_path: str, scx_data: dict, tex_list: list = None):
+    write_scx_data(scx_path, scx_data)
+    if tex_list:
+        write_tex_list(scx_path, tex_list)